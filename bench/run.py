@@ -0,0 +1,145 @@
+"""
+Benchmark the fetch → parse → plot pipeline of SpecViewer against a stand-in SAS (see `bench/sas.py`), timing
+each stage separately, and write the results (in ms) as JSON, e.g., for comparison between commits.
+
+	python bench/run.py [-n 5] [--latency 0.02] [--out temp/bench.json]
+
+It runs in a scratch directory (`temp/bench/`) with a synthetic `bhm.json.zst` of objects with 1, 6, 12, and 50
+epochs, so neither SAS credentials nor network access are needed.
+"""
+
+import json as JSON
+import os
+import shutil
+import socket
+import subprocess
+import sys
+from argparse import ArgumentParser
+from collections.abc import Callable
+from datetime import datetime, timezone
+from statistics import median, quantiles
+from time import perf_counter
+from typing import Any
+
+from pyzstd import compress as zstd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EPOCHS = (1, 6, 12, 50) # objects (catalog IDs) with that many epochs
+FIELD = 101000 # v6.2+ layout
+
+def bhm_json() -> dict[str, Any]:
+	cat = {f"{1000 + n}": [0] + [FIELD * 10**5 + 60000 + 7 * i for i in range(n)] for n in EPOCHS}
+	return dict(
+		hdr=dict(date="2100-01-01T00:00:00", dims=[0, 0], nrow=dict(prg=1, fld=1, sid=0, cat=len(cat))),
+		prg={"bench": [FIELD]},
+		fld={f"{FIELD}": sorted(map(int, cat))},
+		sid={},
+		cat=cat,
+	)
+
+def free_port() -> int:
+	with socket.socket() as s:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+
+def stats(ts: list[float]) -> dict[str, float | int]:
+	ts = sorted(t * 1e3 for t in ts)
+	p90 = quantiles(ts, n=10, method="inclusive")[-1] if len(ts) > 1 else ts[0] # interpolated linearly
+	return dict(n=len(ts), min=ts[0], median=median(ts), p90=p90, max=ts[-1])
+
+def main(argv: list[str]) -> None:
+	p = ArgumentParser(description=__doc__.strip().splitlines()[0])
+	p.add_argument("-n", type=int, default=5, help="repetitions of each stage")
+	p.add_argument("--latency", type=float, default=0.02, help="mean latency of the stand-in SAS in seconds")
+	p.add_argument("--miss", type=float, default=0.0, help="ratio of missing files of the stand-in SAS")
+	p.add_argument("--out", default="temp/bench.json")
+	args = p.parse_args(argv)
+	out = os.path.abspath(args.out)
+
+	# scratch directory with a synthetic dictionary and credentials
+	work = os.path.join(ROOT, "temp", "bench")
+	shutil.rmtree(work, ignore_errors=True)
+	os.makedirs(os.path.join(work, "data"))
+	with open(os.path.join(work, "data", "bhm.json.zst"), "wb") as io:
+		io.write(zstd(JSON.dumps(bhm_json()).encode()))
+	with open(os.path.join(work, "authentication.txt"), "w") as io:
+		io.write("bench\nbench\n")
+
+	port = free_port()
+	server = subprocess.Popen([sys.executable, os.path.join(ROOT, "bench", "sas.py"), "--port", f"{port}",
+		"--latency", f"{args.latency}", "--miss", f"{args.miss}", "--auth", "bench:bench"], stdout=subprocess.PIPE)
+	try:
+		assert server.stdout and server.stdout.readline() # ready
+		os.environ["SAS_REMOTE"] = f"http://127.0.0.1:{port}/sas"
+		for k in ("HTTP_RECORD", "HTTP_REPLAY", "SAS_MIRRORS"): os.environ.pop(k, None)
+		os.chdir(work)
+		sys.path.insert(0, ROOT)
+		res = run(args.n)
+	finally:
+		server.terminate()
+
+	commit = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+	doc = dict(
+		commit=commit.stdout.strip(), date=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+		python=sys.version.split()[0], config=dict(n=args.n, latency=args.latency, miss=args.miss),
+		results=res,
+	)
+	os.makedirs(os.path.dirname(out), exist_ok=True)
+	with open(out, "w") as io: JSON.dump(doc, io, indent=1)
+	print(JSON.dumps(res, indent=1))
+	print(f"Written to `{out}`")
+
+def run(n: int) -> dict[str, dict[str, float | int]]:
+	t = perf_counter()
+	import sdssv_spec_appREMOTE as app # builds the index, and verifies the credentials
+	res: dict[str, dict[str, float | int]] = dict(import_app=stats([perf_counter() - t]))
+
+	def timed(name: str, f: Callable[[], Any], setup: None | Callable[[], Any] = None) -> Any:
+		ts = list[float]()
+		for _ in range(n):
+			if setup: setup()
+			t = perf_counter()
+			r = f()
+			ts.append(perf_counter() - t)
+		res[name] = stats(ts)
+		return r
+
+	def cold() -> None: # forget everything fetched, in memory and on disk
+		app.fetch_cache.clear()
+		app.cached_fetch.cache_clear()
+		app.url_exists.cache_clear()
+		app.sas_listing.cache_clear()
+		app.sas_miss.data.clear()
+		shutil.rmtree(app.sas_cache_local, ignore_errors=True)
+
+	def rm_index() -> None:
+		os.remove(app.bhm_index_local)
+
+	timed("load_index_build", app.load_index, rm_index)
+	timed("load_index_open", app.load_index)
+
+	mjd, cat = 60000, 1000 + EPOCHS[0]
+	fetch = lambda: app.SDSSV_fetch("", "", FIELD, mjd, cat)
+	fetch() # let the stand-in generate the file once
+	timed("SDSSV_fetch_cold", fetch, cold)
+	timed("SDSSV_fetch_warm", fetch)
+	rec = fetch()[0]
+	timed("Meta_init", lambda: app.Meta.of(rec))
+
+	for k in EPOCHS:
+		f = lambda: app.fetch_catID("all", f"{1000 + k}", max_epochs=0)
+		f()
+		timed(f"fetch_catID_{k}_cold", f, cold)
+		timed(f"fetch_catID_{k}_warm", f)
+
+	for k in EPOCHS:
+		args: tuple[Any, ...] = ("all", "", "", f"{1000 + k}", "", "", "any", "", "", "", "", "", [], [], 1, 1, ["e"], {}, 0)
+		app.make_multiepoch_spectra(*args) # fetch (with the default `max_epochs`) beforehand
+		fig = timed(f"make_multiepoch_spectra_{k}", lambda: app.make_multiepoch_spectra(*args))[0]
+		timed(f"figure_to_json_{k}", fig.to_json)
+		args = args[:14] + (51,) + args[15:] # smoothed
+		timed(f"make_multiepoch_spectra_{k}_smooth", lambda: app.make_multiepoch_spectra(*args))
+	return res
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
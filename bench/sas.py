@@ -0,0 +1,129 @@
+"""
+A stand-in for SAS serving synthetic `spec-*.fits` files (lite, i.e., PRIMARY, COADD, SPALL, ZALL, ZLINE),
+at any path in the shapes built by `util.sdss_sas_fits`, for load testing. Files are generated on the fly and
+deterministically from their path, and so is whether a path is missing (see `--miss`). Supports HEAD, Range
+requests, Basic auth (for `sdsswork` only, as SAS does), and a configurable latency.
+
+	python bench/sas.py --port 8000 --latency 0.05 --miss 0.5
+	SAS_REMOTE=http://127.0.0.1:8000/sas python sdssv_spec_appREMOTE.py
+"""
+
+import sys
+from argparse import ArgumentParser
+from base64 import b64encode
+from functools import lru_cache
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO as IOBuffer
+from random import expovariate
+from re import fullmatch, search
+from time import sleep
+
+import numpy
+from astropy.io import fits # type: ignore[import-untyped]
+
+SPEC_FILE = r"spec-(?P<field>\w+?)-(?P<mjd>\d+)-(?P<obj>\d+)\.fits"
+
+class Config:
+	latency = 0.0 # seconds (mean, exponentially distributed)
+	miss = 0.0 # ratio of missing (404) files
+	auth = "" # base64 of `user:password`, if required for `sdsswork`
+	size = 4648 # pixels per spectrum
+
+def seed(path: str) -> int:
+	return int.from_bytes(sha256(path.encode()).digest()[:8], "little")
+
+def exists(path: str) -> bool:
+	return seed(path) % 10**6 >= Config.miss * 10**6
+
+@lru_cache(1024)
+def spec_fits(path: str) -> bytes:
+	"""
+	A synthetic lite spectrum for `path`, with realistic HDUs and columns (roughly the size of a real one).
+	"""
+	m = search(SPEC_FILE + "$", path)
+	if not m: raise ValueError(path)
+	field, mjd, obj = m["field"], int(m["mjd"]), int(m["obj"])
+	branch = (search(r"/redux/([^/]+)/", path) or ["", ""])[1]
+	rng = numpy.random.default_rng(seed(path))
+	n = Config.size
+	loglam = numpy.float32(3.5523) + numpy.float32(1e-4) * numpy.arange(n, dtype=numpy.float32)
+	z = float(rng.uniform(0.1, 3))
+	flux = 5 + 20 * (10**loglam / 5000) ** -1.5
+	for line in (1215.67, 1549.06, 2798.75, 4862.68, 6564.61): # Lyα, C IV, Mg II, Hβ, Hα
+		flux += 30 * numpy.exp(-0.5 * ((10**loglam - line * (1 + z)) / (15 * (1 + z))) ** 2)
+	ivar = numpy.full(n, 0.25, numpy.float32)
+	flux = (flux + rng.normal(0, 2, n)).astype(numpy.float32)
+	zero = numpy.zeros(n, numpy.float32)
+	coadd = fits.BinTableHDU.from_columns([
+		fits.Column("FLUX", "E", array=flux), fits.Column("LOGLAM", "E", array=loglam),
+		fits.Column("IVAR", "E", array=ivar), fits.Column("AND_MASK", "J", array=zero.astype(numpy.int32)),
+		fits.Column("OR_MASK", "J", array=zero.astype(numpy.int32)), fits.Column("WDISP", "E", array=zero + 1),
+		fits.Column("SKY", "E", array=zero), fits.Column("MODEL", "E", array=flux),
+	], name="COADD")
+	obs = "LCO" if field.endswith("_lco") or field.isdigit() and int(field) >= 100000 and obj % 2 else "APO"
+	ra, dec = float(rng.uniform(0, 360)), float(rng.uniform(-90, 90))
+	row = dict(
+		CATALOGID=("K", obj), SDSS_ID=("K", obj % 10**8), FIELD=("J", int(field) if field.isdigit() else 0),
+		MJD=("J", mjd), MJD_FINAL=("D", mjd + 0.5), RUN2D=("16A", branch), RUN1D=("16A", branch),
+		OBS=("3A", obs), RACAT=("D", ra), DECCAT=("D", dec), RA=("D", ra), DEC=("D", dec),
+		Z=("E", z), ZWARNING=("J", 0), RCHI2=("E", float(rng.uniform(0.8, 1.5))),
+		PROGRAMNAME=("16A", "bhm_rm"), SURVEY=("16A", "BHM"), OBJTYPE=("16A", "science"),
+	)
+	spall = fits.BinTableHDU.from_columns([fits.Column(k, f, array=[v]) for k, (f, v) in row.items()], name="SPALL")
+	zall = fits.BinTableHDU.from_columns([fits.Column(k, "E", array=rng.uniform(0, 3, 100))
+		for k in ("Z", "Z_ERR", "RCHI2", "DOF", "RCHI2DIFF", "THETA", "VDISP", "VDISP_ERR")], name="ZALL")
+	zline = fits.BinTableHDU.from_columns([fits.Column(k, "E", array=rng.uniform(0, 9, 32))
+		for k in ("LINEWAVE", "LINEZ", "LINESIGMA", "LINEAREA", "LINEEW", "LINECONTLEVEL")], name="ZLINE")
+	io = IOBuffer()
+	fits.HDUList([fits.PrimaryHDU(), coadd, spall, zall, zline]).writeto(io)
+	return io.getvalue()
+
+class Handler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1" # keep-alive
+
+	def log_message(self, format: str, *args) -> None:
+		pass
+
+	def reply(self, status: int, body: bytes = b"", headers: dict[str, str] = {}) -> None:
+		self.send_response(status)
+		for k, v in headers.items(): self.send_header(k, v)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		if self.command != "HEAD": self.wfile.write(body)
+
+	def do_GET(self) -> None:
+		if Config.latency: sleep(expovariate(1 / Config.latency))
+		path = self.path.split("?", 1)[0]
+		if Config.auth and "/sas/sdsswork/" in path and self.headers.get("Authorization") != f"Basic {Config.auth}":
+			return self.reply(401, headers={"WWW-Authenticate": 'Basic realm="SDSS-V"'})
+		if path.endswith("/"):
+			return self.reply(403) # directory listing disabled, as files are made up on demand
+		if not (fullmatch(r"/sas/.*/" + SPEC_FILE, path) and exists(path)):
+			return self.reply(404)
+		data = spec_fits(path)
+		if not (m := fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))):
+			return self.reply(200, data, {"Accept-Ranges": "bytes", "Content-Type": "application/fits"})
+		a, b = int(m[1] or 0), min(int(m[2]) if m[2] else len(data) - 1, len(data) - 1)
+		if not m[1]: a, b = max(0, len(data) - int(m[2] or 0)), len(data) - 1 # suffix
+		if a > b: return self.reply(416, headers={"Content-Range": f"bytes */{len(data)}"})
+		self.reply(206, data[a:b + 1], {"Content-Range": f"bytes {a}-{b}/{len(data)}", "Content-Type": "application/fits"})
+
+	do_HEAD = do_GET
+
+def main(argv: list[str]) -> None:
+	p = ArgumentParser(description=__doc__.strip().splitlines()[0])
+	p.add_argument("--host", default="127.0.0.1")
+	p.add_argument("--port", type=int, default=8000)
+	p.add_argument("--latency", type=float, default=0.0, help="mean latency in seconds")
+	p.add_argument("--miss", type=float, default=0.0, help="ratio of missing (404) files")
+	p.add_argument("--auth", default="", help="`user:password` required for sdsswork")
+	args = p.parse_args(argv)
+	Config.latency, Config.miss = args.latency, args.miss
+	Config.auth = b64encode(args.auth.encode()).decode() if args.auth else ""
+	with ThreadingHTTPServer((args.host, args.port), Handler) as server:
+		print(f"Serving a stand-in SAS at http://{args.host}:{server.server_port}/sas/", flush=True)
+		server.serve_forever()
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -8,36 +8,36 @@ Excelsior!
 import contextlib
 import io as _io
 from base64 import b64decode as base64decode
-from collections import defaultdict
+from base64 import b64encode as base64encode
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from dataclasses import replace as evolve
 from functools import lru_cache
-from io import BytesIO as IOBuffer
 from math import log10
 from math import nan as NaN
+from os import getenv, getpid, pathsep, remove, replace
 from pathlib import Path
 from posixpath import basename
 from re import IGNORECASE, fullmatch
 from tempfile import TemporaryDirectory as mktempdir
-from threading import RLock as ReentrantLock
-from time import sleep
+from threading import Event, Lock, Thread
+from time import sleep, time
 from traceback import print_exc
 from typing import Any, cast
 from warnings import catch_warnings, filterwarnings, simplefilter
 
 # from sparcl.client import SparclClient
 import numpy
-from astropy.convolution import Box1DKernel, convolve # type: ignore[import-untyped]
-from astropy.io.fits import BinTableHDU, FITS_rec # type: ignore[import-untyped]
-from astropy.io.fits import open as FITS
 from astropy.time import Time
 from numpy import mean, median, ndarray, sqrt, std
 from plotly.graph_objects import Figure, Scatter # type: ignore[import-untyped]
+from pyzstd import compress as zstd
 from pyzstd import open as ZSTD
-from requests import request
-from requests.exceptions import ChunkedEncodingError, ConnectionError, HTTPError
+from requests.exceptions import HTTPError
 
 import util
-from util import identity, isa, isfile, nextfloat, parse_json, sdss_iau, sdss_sas_fits, sdss_zwarn, write
+from util import identity, isa, isfile, nextfloat, parse_json, sdss_iau, sdss_sas_fits, sdss_zwarn, unzstd, write
 
 ### Import several important functions from util/sdss.py etc.
 
@@ -51,53 +51,132 @@ with catch_warnings():
 
 ### Fetch an SDSS spectrum and print out its URL and its speclink URL
 
+# durations of callbacks & fetches, bytes downloaded, and hits & misses of each cache layer, served at /metrics
+metrics = util.Metrics()
+
 def fetch(url: str, auth: None | tuple[str, str] = None, speclink: str = "", timeout: float = 5) -> bytes:
-	try:
-		rv = request("GET", url, auth=auth, timeout=timeout)
-	except ChunkedEncodingError: # Connection broken: IncompleteRead
-		rv = request("GET", url, auth=auth, timeout=timeout)
-	except ConnectionError as e: # ConnectTimeout | ProxyError | SSLError
-		print(e)
-		sleep(1)
-		return fetch(url, auth, speclink, timeout=min(60, 2 * timeout))
+	rv = util.http_request("GET", url, auth, timeout) # pooled per host, with bounded retries
+	metrics.inc("sas_bytes_total", len(rv.content))
 	if (rv.status_code != 404):
 		print(rv.status_code, url)
 		if speclink: print("   ", speclink)
 	rv.raise_for_status() # HTTPError
 	return rv.content
-def unzstd(f: str) -> bytes:
-	with ZSTD(f) as io: r = io.read()
-	# update (override) a decompressed file (if already exists) for consistency
-	if f.endswith(e := ".zst") and isfile(g := f[:-len(e)]): write(g, r)
-	return r
+
+@metrics.timed("download_seconds") # (the fallback to `fetch` is included)
+def fetch_fits(url: str, auth: None | tuple[str, str] = None, speclink: str = "", hdus: int = 3) -> bytes:
+	"""
+	Fetch only the first `hdus` HDUs (i.e., PRIMARY, COADD, SPALL) of a FITS file by HTTP range requests,
+	or the whole file if the server does not support them.
+	"""
+	io = util.RangeFile(url, auth)
+	try:
+		data = util.fits_prefix(io.read, hdus)
+	except HTTPError as e:
+		if e.response is not None and e.response.status_code != 404: print(e.response.status_code, url)
+		raise
+	except (EOFError, KeyError, ValueError) as e: # not a (valid) FITS file
+		print(f"[fetch_fits] {e!r}")
+		return fetch(url, auth, speclink)
+	finally:
+		metrics.inc("sas_bytes_total", io.size)
+	print(206 if io.data is None else 200, url, f"({io.size} bytes)")
+	if speclink: print("   ", speclink)
+	return data
 
 # mypy: disable-error-code="assignment, func-returns-value"
 # pyright: reportArgumentType=false, reportAttributeAccessIssue=false, reportPossiblyUnboundVariable=false
 
 authentication = "authentication.txt"
 bhm_data_local = "data/bhm.json.zst"
+bhm_index_local = "data/bhm.idx"
 bhm_meta_local = "data/bhm.meta.json"
-
-# check that the local bhm.json and bhm.json.zst files are up to date; if not, update them
-while True:
-	remote = "https://github.com/Heptazhou/SDSS-SpecViewer/releases" + "/download/v1.0.0/"
-	if isfile(bhm_data_local):
+bhm_patch_remote = "bhm.json.patch.zst" # delta from the previous release (`base` in bhm.meta.json)
+bhm_remote = "https://github.com/Heptazhou/SDSS-SpecViewer/releases" + "/download/v1.0.0/"
+fetch_cache_size = 2**30 # bytes of spectra (arrays) to keep in memory
+sas_cache_local = "data/cache"
+sas_cache_size = 4 * 2**30 # bytes (compressed) of FITS files to keep on disk
+sas_cache_ttl = 86400 # seconds, for `master` only, as tagged branches are immutable
+sas_mirrors = [x for x in getenv("SAS_MIRRORS", "").split(pathsep) if x] # local copies of the `sas` tree
+sas_miss_ttl = 86400, 30 * 86400 # seconds, to remember a missing spectrum of `master` and tagged branches
+sas_remote = getenv("SAS_REMOTE", "") # e.g., `http://127.0.0.1:8000/sas` of bench/sas.py instead of SAS
+smooth_cache_size = 2**28 # bytes of smoothed spectra (arrays) to keep in memory
+
+# global cache to save results of `SDSSV_fetch` and `fetch_catID`, bounded by the memory size of arrays
+fetch_cache = util.ByteLRU(fetch_cache_size)
+fetch_flight = util.SingleFlight() # coalesce concurrent calls of `locked_fetch` and `fetch_catID` (by key)
+smooth_cache = util.ByteLRU(smooth_cache_size) # see `smooth_spectra`
+
+def load_index(f: str = bhm_index_local, src: str = bhm_data_local) -> util.BhmIndex:
+	"""
+	Open the columnar (memory-mapped) index of `src`, (re)building it first if missing or outdated.
+	"""
+	stamp = util.filestamp(src)
+	if idx := util.open_index(f, stamp): return idx
+	print(f"Building `{f}` from `{src}` (once per update) ...")
+	util.unzstd_sibling(src) # update (override) a decompressed file (if already exists) for consistency
+	with ZSTD(src, "rt", encoding="utf-8", newline="") as io: util.build_index(f, util.iter_json_items(io), stamp)
+	return cast(util.BhmIndex, util.open_index(f, stamp))
+
+def update_index(remote: str = bhm_remote) -> bool:
+	"""
+	Download the latest bhm.json.zst if it is newer than the local one, validate it against the remote
+	bhm.meta.json, and then replace the local files and swap the index in (atomically, as a whole).
+	"""
+	global bhm
+	meta = parse_json(fetch(remote + basename(bhm_meta_local), timeout=10))
+	if "bhm" in globals() and bhm.hdr["date"] >= meta["date"]: return False # already latest
+	tmp, new = f"{bhm_data_local}.{getpid()}.tmp", f"{bhm_index_local}.{getpid()}.tmp"
+	try:
+		patched = False
+		if "bhm" in globals() and meta.get("base") == bhm.hdr["date"]:
+			# apply the delta patch against the installed version if possible (checksum verified)
+			try:
+				raw = util.unzstd_patch(unzstd(bhm_data_local), fetch(remote + bhm_patch_remote, timeout=60))
+				patched = write(tmp, zstd(raw, 3)) > 0
+				del raw
+			except Exception as e:
+				print(f"[update_index] fall back to full download: {e!r}")
+		if not patched:
+			write(tmp, fetch(remote + basename(bhm_data_local), timeout=60))
+		with ZSTD(tmp, "rt", encoding="utf-8", newline="") as io:
+			util.build_index(new, util.iter_json_items(io), stamp := util.filestamp(tmp))
+		idx = cast(util.BhmIndex, util.open_index(new, stamp))
+		if idx.hdr["date"] != meta["date"] or any(len(getattr(idx, k)) != n
+			for k, n in meta["nrow"].items() if k != "prg"):
+			raise ValueError(f"[update_index] `{basename(bhm_data_local)}` does not match its meta")
+		del idx
+		replace(tmp, bhm_data_local)
+		try: replace(new, f := bhm_index_local)
+		except OSError: f = new # index in use (on Windows); rebuilt upon next start
+		bhm = cast(util.BhmIndex, util.open_index(f, stamp))
+		fetch_cache.clear()
+	finally:
+		for x in (tmp, new):
+			with contextlib.suppress(OSError): remove(x)
+	print("Updated", {k: v for k, v in bhm.hdr.items() if k in ["date", "dims", "nrow", "size"]})
+	return True
+
+def update_index_daemon(interval: float = 86400) -> None:
+	while True:
+		try: update_index()
+		except Exception as e: print(f"[update_index] skipped: {e!r}")
+		print("[fetch_cache]", fetch_cache.stats())
+		sleep(interval)
+
+# serve from the local bhm.json.zst straight away, and check for a newer one in the background (see below);
+# only if there is no usable local file at all, wait for the download to finish before starting
+try:
+	bhm: util.BhmIndex = load_index()
+except Exception:
+	if isfile(bhm_data_local): print_exc()
+	while True:
 		try:
-			lcl_data = parse_json(unzstd(bhm_data_local))
-			rmt_meta = parse_json(fetch(remote + basename(bhm_meta_local)))
-			if lcl_data["hdr"]["date"] >= rmt_meta["date"]: break # already latest
-		except HTTPError: break # skip update
-		except: print_exc()
-	try: write(bhm_data_local, fetch(remote + basename(bhm_data_local)))
-	except HTTPError: sleep(1) # retry after delay
-
-metadata: dict[str, list | dict | str | int] = lcl_data["hdr"]
-programs: dict[str, list[int]] = lcl_data["prg"]
-fieldIDs: dict[str, list[int]] = lcl_data["fld"]
-sdss_IDs: dict[str, list[int]] = lcl_data["sid"]
-catalogs: dict[str, list[int]] = lcl_data["cat"]
-
-print({k: v for k, v in metadata.items() if k in ["date", "dims", "nrow", "size"]})
+			if update_index() or "bhm" in globals(): break
+		except Exception: print_exc()
+		sleep(5) # retry after delay
+
+print({k: v for k, v in bhm.hdr.items() if k in ["date", "dims", "nrow", "size"]})
 
 # the redshift and stepping to easily adjust redshift using arrow keys or mouse wheel, disabled by default
 # because unfortunately, setting a numeric `step` attribute for an `input` element also means the value of
@@ -105,10 +184,6 @@ print({k: v for k, v in metadata.items() if k in ["date", "dims", "nrow", "size"
 # making an arbitrary input to be invalid, but we always want to accept redshift of any precision
 redshift_default = 0
 
-# global dict to save results of `SDSSV_fetch` and `fetch_catID`
-fetch_cache: dict[tuple, tuple] = {}
-fetch_queue: dict[str, ReentrantLock] = defaultdict(ReentrantLock)
-
 # default y-axis range of spectrum plots
 y_max_default = 20
 y_min_default = 0
@@ -134,29 +209,89 @@ external_stylesheets = [ "https://codepen.io/chriddyp/pen/bWLwgP.css",
 ###
 
 def some(x: Any) -> bool: return x not in (None, NaN, "")
-def get(hdu: FITS_rec, col: str, default: None = None):
-	if not hasattr(hdu, col): return default
-	ret = cast(ndarray, hdu[col]).item(0) # stupid numpy.char.chararray :(
-	if isa(ret, str): ret = ret.strip()
+def get(hdu: dict[str, Any], col: str, default: None = None):
+	return hdu.get(col, default)
+
+def smooth_spectra(fluxes: list[ndarray], width: int) -> list[ndarray]:
+	"""
+	Smooth each spectrum by `util.box_smooth`, those of the same length stacked into one call, memoized per
+	spectrum (by identity, as the arrays cached by `fetch_catID` are reused as is) and width.
+	"""
+	ret: list[ndarray] = [*fluxes]
+	todo: dict[int, list[int]] = {} # by length
+	for i, x in enumerate(fluxes):
+		if (r := smooth_cache.get((id(x), width))) is not None and r[0] is x: ret[i] = r[1] # not a reused id
+		else: todo.setdefault(len(x), []).append(i)
+	for idx in todo.values():
+		ys = util.box_smooth(numpy.stack([fluxes[i] for i in idx]), width)
+		for i, y in zip(idx, ys):
+			ret[i] = y = y.copy() # not to keep the whole stack alive
+			smooth_cache[(id(fluxes[i]), width)] = fluxes[i], y
 	return ret
 
+def sas_auth(url: str) -> None | tuple[str, str]:
+	return (username, password) if url.startswith("https://data.sdss5.org/sas/sdsswork/") else None # before rebase
+
+sas_cache = util.DiskCache(sas_cache_local, sas_cache_size)
+sas_miss = util.MissCache(f"{sas_cache_local}/miss.jsonl") # `(field, mjd, obj, branch)` known to be 404
+
 @lru_cache(64)
 def cached_fetch(url: str, speclink: str) -> bytes:
-	return fetch(url, (username, password) if url.startswith("https://data.sdss5.org/sas/sdsswork/") else None, speclink)
+	ttl = sas_cache_ttl if "/redux/master/" in url else None
+	if (data := sas_cache.get(url, ttl)) is not None:
+		metrics.inc("cache_lookups_total", layer="sas_cache", result="hit")
+		return data
+	metrics.inc("cache_lookups_total", layer="sas_cache", result="miss")
+	data = fetch_fits(util.sdss_sas_rebase(url, sas_remote), sas_auth(url), speclink)
+	sas_cache.put(url, data)
+	return data
 def locked_fetch(url: str, speclink: str) -> bytes:
-	with fetch_queue[url]: r = cached_fetch(url, speclink)
-	return r
+	return fetch_flight(url, cached_fetch, url, speclink)
 
-@lru_cache(2048) # PBH existence check
-def url_exists(url: str) -> bool:
+probe_pool = ThreadPoolExecutor(util.HTTP_POOL_SIZE, "probe") # HEAD requests only
+fetch_pool = ThreadPoolExecutor(util.HTTP_POOL_SIZE, "fetch") # `SDSSV_fetch` of many epochs at once
+
+@lru_cache(256)
+def sas_listing(url: str, _hour: int = 0) -> None | frozenset[str]:
+	"""
+	The file names in the SAS directory `url` (which ends with a slash), an empty set if the directory does not
+	exist, or `None` if unknown. Pass the current hour as `_hour` to refresh the (cached) listing hourly.
+	"""
+	try:
+		rv = util.http_request("GET", util.sdss_sas_rebase(url, sas_remote), sas_auth(url), timeout=10, retries=2)
+	except Exception:
+		return None
+	if rv.status_code == 404: return frozenset()
+	if rv.status_code != 200 or "html" not in rv.headers.get("Content-Type", ""): return None
+	return util.http_listing(rv.text)
+
+def url_listed(url: str) -> None | bool:
+	"""
+	Whether the file `url` is in the (hourly cached) listing of its SAS directory, or `None` if unknown.
+	"""
+	# a single listing of the directory answers for all the spectra in the same field & MJD (& branch)
+	if (names := sas_listing(url.rsplit("/", 1)[0] + "/", int(time() // 3600))) is None: return None
+	return basename(url) in names
+
+def url_status(url: str) -> int:
+	if util.sdss_sas_local(url, sas_mirrors): return 200
+	if (listed := url_listed(url)) is not None: return 200 if listed else 404
 	try:
-		rv = request("HEAD", url, timeout=3)
-		return rv.status_code == 200
+		rv = util.http_request("HEAD", util.sdss_sas_rebase(url, sas_remote), sas_auth(url), timeout=3, retries=2)
+		return rv.status_code
 	except Exception:
-		return False
+		return 0
+
+@lru_cache(2048) # PBH existence check
+def url_exists(url: str) -> bool:
+	return url_status(url) == 200
+
+# branches to try (in order) when not specified
+# some object seems to only exist in v6.1.0 so we have to keep it here :(
+sdssv_branches = ("master", "v6_2_1", "v6_2_0", "v6_1_3", "v6_0_9", "v6_1_0")
 
 def SDSSV_fetch(username: str, password: str, field: int | str, mjd: int, obj: int | str, branch="") \
-	-> tuple[FITS_rec, ndarray, ndarray, ndarray]:
+	-> tuple[dict[str, Any], util.LogGrid | ndarray, ndarray]:
 	"""
 	Fetch spectral data for a SDSS-RM object in a specific field
 	on a specific MJD, using the user supplied authentication.
@@ -179,48 +314,74 @@ def SDSSV_fetch(username: str, password: str, field: int | str, mjd: int, obj: i
 	field, obj = str(field), str(obj) # ensure type
 
 	_key = (field, mjd, obj, branch)
-	if _key in fetch_cache:
-		return fetch_cache[_key]
+	if (r := fetch_cache.get(_key)) is not None:
+		return r
 	if not (field and mjd and obj):
 		raise HTTPError(f"[SDSSV_fetch] {_key}")
-	if not branch or branch == "legacy":
-		# try all the branches below in the order listed
-		for v in ("26", "104", "103") if branch == "legacy" \
-			else ("master", "v6_2_1", "v6_2_0", "v6_1_3", "v6_0_9", "v6_1_0"):
-			# some object seems to only exist in v6.1.0 so we have to keep it here :(
+	if not branch and fullmatch(r"\d+", field) and (found := bhm.branches(int(field), mjd, obj)):
+		# the branches are known from the index, so try them in the order listed below without probing
+		order = sdssv_branches
+		for v in sorted(found, key=lambda v: order.index(v) if v in order else len(order)):
 			try: return SDSSV_fetch(username, password, field, mjd, obj, v)
 			except HTTPError: pass
 			except Exception: print_exc()
+	if not branch or branch == "legacy":
+		# probe all the branches below at once (HEAD), then try them in the order listed
+		keys = [k for v in (("26", "104", "103") if branch == "legacy" else sdssv_branches)
+			if (k := (field, mjd, obj, v)) not in sas_miss]
+		urls = [sdss_sas_fits(*k)[0] for k in keys]
+		probes = [probe_pool.submit(url_status, url) for url in urls]
+		for k, url, probe in zip(keys, urls, probes):
+			if probe.result() == 404: # anything else (e.g., timeout) is left to the download
+				# spectra are still added to `master`, so a miss from a listing (up to an hour old) is not kept
+				if k[3] != "master" or url_listed(url) is None: sas_miss.add(k, sas_miss_ttl[k[3] != "master"])
+				continue
+			try: return SDSSV_fetch(username, password, *k)
+			except HTTPError: pass
+			except Exception: print_exc()
 		raise HTTPError(f"[SDSSV_fetch] {_key}")
 
 	url, speclink = sdss_sas_fits(field, mjd, obj, branch) # speclink added PBH 2025-11-06
+	if local := util.sdss_sas_local(url, sas_mirrors):
+		metrics.inc("cache_lookups_total", layer="sas_mirrors", result="hit")
+		data = numpy.memmap(local, mode="r") # read in place
+	elif _key in sas_miss:
+		metrics.inc("cache_lookups_total", layer="sas_miss", result="hit")
+		raise HTTPError(f"[SDSSV_fetch] {_key}")
+	else:
+		try:
+			data = locked_fetch(url, speclink) # prevent duplicated requests
+		except HTTPError as e:
+			if e.response is not None and e.response.status_code == 404:
+				sas_miss.add(_key, sas_miss_ttl[branch != "master"])
+			raise
 
+	# only the columns needed, read as views over `data` (no copy) into a single block, so `data` is dropped
 	numpy.seterr(divide="ignore") # Python does not comply with IEEE 754 :(
-	fits = FITS(IOBuffer(locked_fetch(url, speclink))) # prevent duplicated requests
-	hdu2 = fits["COADD"] if "COADD" in fits else fits[1]
-	hdu3 = fits["SPALL"] if "SPALL" in fits else fits[2] # SPECOBJ
-	assert isa(hdu2, BinTableHDU) and isa(hdu2.data, FITS_rec)
-	assert isa(hdu3, BinTableHDU) and isa(hdu3.data, FITS_rec)
-	meta = hdu3.data
-	wave = cast(ndarray, hdu2.data["LOGLAM"]) # lg(λ)
-	flux = cast(ndarray, hdu2.data["FLUX"  ]) # f_λ
-	errs = cast(ndarray, hdu2.data["IVAR"  ]) # τ = σ⁻²
-	wave = 10**wave                           # λ
-	errs = 1 / sqrt(errs)                     # σ
+	hdu2 = util.fits_table(data, "COADD", 1)
+	hdu3 = util.fits_table(data, "SPALL", 2) # SPECOBJ
+	if hdu2 is None or hdu3 is None: raise ValueError(f"[SDSSV_fetch] not a spectrum: `{basename(url)}`")
+	meta = util.fits_scalars({k: v for k, v in hdu3.items() if k in meta_columns})
+	wave = hdu2["LOGLAM"] # lg(λ)
+	spec = numpy.empty((2, len(wave)), numpy.float32)
+	spec[0] = hdu2["FLUX"] # f_λ
+	spec[1] = hdu2["IVAR"] # τ = σ⁻²
+	wave = util.LogGrid.of(wave) or 10**wave  # λ (as a grid if uniform in lg(λ), i.e., not materialized)
+	spec[1] = 1 / sqrt(spec[1])               # σ
 	## PBH testing optional scaling for allepoch coadds only
 	# print(f"meta: {type(meta)} = {str(meta)[:100]}")
 	# print(f"wave: {type(wave)} = {str(wave)[:100]}")
-	# print(f"flux: {type(flux)} = {str(flux)[:100]}")
+	# print(f"spec: {type(spec)} = {str(spec)[:100]}")
 	if some(RUN2D := get(meta, "RUN2D")) and RUN2D != branch:
 		print(f"Error: unexpected {RUN2D=} with {branch=} in `{basename(url)}`")
-		meta["RUN2D"][0] = ""
+		meta["RUN2D"] = ""
 	if some(OBS := get(meta, "OBS")) and (
 		field == "allepoch_apo" and OBS != "APO" or
 		field == "allepoch_lco" and OBS != "LCO" or
 		OBS not in ("APO", "LCO")):
 		print(f"Error: unexpected {OBS=} with {field=} in `{basename(url)}`")
-		meta["OBS"][0] = ""
-	r = meta, wave, flux, errs
+		meta["OBS"] = ""
+	r = meta, wave, spec
 	fetch_cache[_key] = r
 	return r
 
@@ -228,6 +389,14 @@ def SDSSV_fetch_allepoch(username: str, password: str, mjd: int, obj: int | str)
 	"""
 	Fetch all epoch spectral data for a given MJD and object using authentication.
 	"""
+	if (found := bhm.allepochs(mjd, obj)) is not None:
+		# the allepoch files are known from the index, so try them in the order below without probing
+		order = [("allepoch_apo", "v6_2_1"), ("allepoch_apo", "v6_2_0"), ("allepoch_lco", "v6_2_1"),
+			("allepoch_lco", "v6_2_0"), ("allepoch", "v6_1_3"), ("allepoch_lco", "v6_1_3"), ("allepoch", "v6_1_1")]
+		for x, branch in sorted(found, key=lambda x: order.index(x) if x in order else len(order)):
+			try: return SDSSV_fetch(username, password, x, mjd, obj, branch)
+			except HTTPError: pass
+		raise HTTPError(f"[SDSSV_fetch] {('allepoch*', mjd, obj)}")
 	if mjd >= 59187:
 		for x in ["allepoch_apo"] if mjd < 60000 else ["allepoch_apo", "allepoch_lco"]:
 			for branch in ("v6_2_1", "v6_2_0"):
@@ -265,9 +434,18 @@ def SDSSV_fetch_allepoch(username: str, password: str, mjd: int, obj: int | str)
 	# field = "allepoch*"
 	# raise HTTPError(f"[SDSSV_fetch] {(field, mjd, obj)}")
 
-@dataclass
+# columns of SPALL (or SPECOBJ) for `Meta`, as {column: (field, type)}, where the latter ones take precedence
+meta_columns = dict(
+	DEC      =("lat", float), RA      =("lon", float), RUN1D    =("ver", str),
+	MJD      =("mjd", float), PLUG_DEC=("lat", float), PLUG_RA  =("lon", float),
+	CATALOGID=("cat", int),   DECCAT  =("lat", float), MJD_FINAL=("mjd", float), OBS  =("obs", str),
+	PLATERUN =("run", str),   RACAT   =("lon", float), RCHI2    =("rc2", float), RUN2D=("ver", str),
+	SDSS_ID  =("sid", int),   Z       =("z", float),   ZWARNING =("zwarn", int),
+)
+
+@dataclass(frozen=True, slots=True)
 class Meta:
-	cats: list[int]
+	cats: list[int] | tuple[()] = () # all catalog IDs of the object (see `fetch_catID`)
 	cat: int = -1 # >0
 	iau: str = ""
 	lat: float = NaN # δ
@@ -281,41 +459,31 @@ class Meta:
 	z: float = NaN
 	zwarn: int = -1 # ≥0
 
-	def __init__(self, hdu: None | FITS_rec = None, is_all_epoch: bool = False) -> None:
-		if hdu is None: return
-		if some(x := get(hdu, "DEC"      )): self.lat = float(x)
-		if some(x := get(hdu, "RA"       )): self.lon = float(x)
-		if some(x := get(hdu, "RUN1D"    )): self.ver = str(x)
-		#
-		if some(x := get(hdu, "MJD"      )): self.mjd = float(x)
-		if some(x := get(hdu, "PLUG_DEC" )): self.lat = float(x)
-		if some(x := get(hdu, "PLUG_RA"  )): self.lon = float(x)
-		#
-		if some(x := get(hdu, "CATALOGID")): self.cat = int(x)
-		if some(x := get(hdu, "DECCAT"   )): self.lat = float(x)
-		if some(x := get(hdu, "MJD_FINAL")): self.mjd = float(x)
-		if some(x := get(hdu, "OBS"      )): self.obs = str(x)
-		if some(x := get(hdu, "PLATERUN" )): self.run = str(x)
-		if some(x := get(hdu, "RACAT"    )): self.lon = float(x)
-		if some(x := get(hdu, "RCHI2"    )): self.rc2 = float(x)
-		if some(x := get(hdu, "RUN2D"    )): self.ver = str(x)
-		if some(x := get(hdu, "SDSS_ID"  )): self.sid = int(x)
-		if some(x := get(hdu, "Z"        )): self.z = float(x)
-		if some(x := get(hdu, "ZWARNING" )): self.zwarn = int(x)
-		#
-		if some(a := self.lon) and some(d := self.lat): self.iau = sdss_iau(a, d)
-		if some(x := get(hdu, "MJD")) and is_all_epoch: self.mjd = max(float(x), self.mjd)
-
-@dataclass
+	@staticmethod
+	def of(hdu: dict[str, Any], is_all_epoch: bool = False) -> "Meta":
+		"""
+		The metadata of a spectrum, given the scalars of its SPALL (or SPECOBJ) row (see `meta_columns`)
+		"""
+		kws: dict[str, Any] = {k: t(x) for col, (k, t) in meta_columns.items() if some(x := hdu.get(col))}
+		if some(a := kws.get("lon", NaN)) and some(d := kws.get("lat", NaN)): kws["iau"] = sdss_iau(a, d)
+		if is_all_epoch and (x := hdu.get("MJD")) is not None and some(x): kws["mjd"] = max(float(x), kws.get("mjd", NaN))
+		return Meta(**kws)
+
+@dataclass(slots=True)
 class Data:
 	meta: Meta
 	name: str
-	wave: ndarray
-	flux: ndarray
-	errs: ndarray
+	wave: util.LogGrid | ndarray
+	spec: ndarray # f_λ & σ, as a contiguous 2×N float32 block
 
+	@property
+	def flux(self) -> ndarray: return self.spec[0]
+	@property
+	def errs(self) -> ndarray: return self.spec[1]
+
+@metrics.timed("fetch_seconds")
 def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: str = "", match_sdss_id: bool = True, max_epochs: int = 12 ) \
-	-> tuple[Meta, list[str], list[ndarray], list[ndarray], list[ndarray]]:
+	-> tuple[Meta, list[str], list[util.LogGrid | ndarray], list[ndarray], list[ndarray]]:
 	"""
 	Fetch all the needed data for an object
 	"""
@@ -327,15 +495,14 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 	catID = str(catID).replace(" ", "")
 	extra = str(extra).replace(" ", "")
 
-	data: list[Data] = []
 	cats: list[int] = [int(catID)] if catID else []
 	cats_all = cats.copy()
-	sid = catalogs.get(catID, [0])[0]
+	sid = bhm.cat.get(catID, [0])[0]
 	if fullmatch(r"\d+", sdss_id):
 		sid = int(sdss_id) or sid
 		match_sdss_id = True # force match_sdss_id
 	if sid > 0:
-		cats_all.extend(sdss_IDs.get(f"{sid}", []))
+		cats_all.extend(bhm.sid.get(f"{sid}", []))
 		cats_all = sorted(set(cats_all))
 	if sid > 0 and match_sdss_id:
 		cats = cats_all
@@ -344,8 +511,19 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 		sid = 0
 		match_sdss_id = False
 	_key = (field, catID, extra, sid, match_sdss_id, max_epochs) # PBH
-	if _key in fetch_cache:
-		return fetch_cache[_key]
+	if (r := fetch_cache.get(_key)) is not None:
+		return r
+	r = fetch_flight(_key, fetch_catID_data, field, catID, extra, sdss_id, cats, cats_all, max_epochs)
+	fetch_cache[_key] = r
+	return r
+
+def fetch_catID_data(field: str, catID: str, extra: str, sdss_id: str, cats: list[int], cats_all: list[int],
+	max_epochs: int) -> tuple[Meta, list[str], list[util.LogGrid | ndarray], list[ndarray], list[ndarray]]:
+	"""
+	Fetch all the needed data for an object, given the catalog IDs resolved by `fetch_catID` (uncached)
+	"""
+	data: list[Data] = []
+	epochs: list[Future[tuple]] = [] # regular epochs being fetched
 	# print(f"[sdss_id] {catID} => {sid} => {cats} # {match_sdss_id}")
 
 	def legend(meta: Meta, base: str = "") -> str:
@@ -366,9 +544,9 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 		except Exception as e:
 			if str(e): print(e) if isa(e, HTTPError) else print_exc()
 			continue
-		meta = Meta(dat[0])
+		meta = Meta.of(dat[0])
 		# print(meta)
-		data.append(Data(meta, wave=dat[1], flux=dat[2], errs=dat[3], name=legend(meta, f"{meta.mjd}*")))
+		data.append(Data(meta, wave=dat[1], spec=dat[2], name=legend(meta, f"{meta.mjd}*")))
 	if fullmatch(r"\d+p?-\d+", field):
 		obj, ver = [*catID.split("@", 1), ""][:2]
 		fid, mjd_ = field.split("-", 1)
@@ -379,13 +557,13 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 			if str(e): print(e) if isa(e, HTTPError) else print_exc()
 			raise # re-raise
 		# print(f"{dat[0].columns=}")
-		meta = Meta(dat[0])
-		data.append(Data(meta, wave=dat[1], flux=dat[2], errs=dat[3], name=legend(meta)))
+		meta = Meta.of(dat[0])
+		data.append(Data(meta, wave=dat[1], spec=dat[2], name=legend(meta)))
 		mjd_list = [mjd]
 	else:
 		mjd_list = []
 		for cat in cats:
-			for fieldmjd in catalogs.get(f"{cat}", [0])[1:]: # {13'FIELD,5'MJD}
+			for fieldmjd in bhm.cat.get(f"{cat}", [0])[1:]: # {13'FIELD,5'MJD}
 				fid, mjd = divmod(abs(fieldmjd), 10**5)
 				if field != "all" and int(field) != fid: continue
 				if mjd not in mjd_list: mjd_list.append(mjd)
@@ -405,47 +583,41 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 			# print(mjd_list) # PBH
 
 		for cat in cats:
-			for fieldmjd in catalogs.get(f"{cat}", [0])[1:]: # {13'FIELD,5'MJD}
+			for fieldmjd in bhm.cat.get(f"{cat}", [0])[1:]: # {13'FIELD,5'MJD}
 				fid, mjd = divmod(abs(fieldmjd), 10**5)
 				if field != "all" and int(field) != fid: continue
 				# print(mjd, " fieldmjd") # PBH
 				if mjd not in mjd_list: continue # ← NEW: skip non-selected epochs
-				try:
-					dat = SDSSV_fetch(username, password, fid, mjd, cat)
-				except Exception as e:
-					if str(e): print(e) if isa(e, HTTPError) else print_exc()
-					continue
-				meta = Meta(dat[0])
-				data.append(Data(meta, wave=dat[1], flux=dat[2], errs=dat[3], name=legend(meta)))
+				epochs.append(fetch_pool.submit(SDSSV_fetch, username, password, fid, mjd, cat)) # collected below
 	# print(mjd_list)
 	# data.sort(key=lambda x: x.meta.mjd)
 
-	#
-	for cat in cats:
-		# for mjd in (x for x in mjd_list_all if x <= 59392):
-		for mjd in (x for x in mjd_list if x <= 59392): # greatly restrict allepoch search for >max_epochs
-			# print(mjd, " allplate") # PBH
-			try:
-				dat = SDSSV_fetch_allepoch(username, password, mjd, cat)
+	# allplate & allFPS: for each cat, the first allepoch spectrum found (MJDs tried in order, objects at once)
+	# for mjd in (x for x in mjd_list_all if x <= 59392):
+	# for mjd in (x for x in mjd_list_all if x >= 59393):
+	def first_allepoch(cat: int, mjds: list[int]) -> None | tuple[int, tuple]:
+		for mjd in mjds:
+			try: return mjd, SDSSV_fetch_allepoch(username, password, mjd, cat)
 			except Exception: # as e: # PBH: stop after first
 				# if str(e): print(e) if isa(e, HTTPError) else print_exc()
 				continue
-			meta = Meta(dat[0], True)
-			data.append(Data(meta, wave=dat[1], flux=dat[2], errs=dat[3], name=legend(meta, f"allplate-{mjd}")))
-			break
-	# allFPS
-	for cat in cats:
-		# for mjd in (x for x in mjd_list_all if x >= 59393):
-		for mjd in (x for x in mjd_list if x >= 59393): # greatly restrict allepoch search for >max_epochs
-			# print(mjd, " allFPS") # PBH
-			try:
-				dat = SDSSV_fetch_allepoch(username, password, mjd, cat)
-			except Exception: # as e: PBH: stop after first
-				# if str(e): print(e) if isa(e, HTTPError) else print_exc()
-				continue
-			meta = Meta(dat[0], True)
-			data.append(Data(meta, wave=dat[1], flux=dat[2], errs=dat[3], name=legend(meta, f"allFPS-{mjd}")))
-			break
+		return None
+	jobs = [(label, fetch_pool.submit(first_allepoch, cat, [mjd
+		for mjd in mjd_list if (mjd <= 59392) == (label == "allplate")])) # greatly restrict allepoch search for >max_epochs
+		for label in ("allplate", "allFPS") for cat in cats]
+	for job in epochs: # regular epochs, fetched along with allepoch ones
+		try:
+			dat = job.result()
+		except Exception as e:
+			if str(e): print(e) if isa(e, HTTPError) else print_exc()
+			continue
+		meta = Meta.of(dat[0])
+		data.append(Data(meta, wave=dat[1], spec=dat[2], name=legend(meta)))
+	for label, job in jobs:
+		if not (ret := job.result()): continue
+		mjd, dat = ret
+		meta = Meta.of(dat[0], True)
+		data.append(Data(meta, wave=dat[1], spec=dat[2], name=legend(meta, f"{label}-{mjd}")))
 	data.sort(key=lambda x: x.meta.mjd + (1e6 if x.name.startswith("all") else 0))
 
 	### PBH+Claude NEW: if more than max_epochs (12 by default, set by &e=# on command line),
@@ -475,17 +647,14 @@ def fetch_catID(field: int | str, catID: int | str, extra: str = "", sdss_id: st
 
 
 	if not data: raise HTTPError(f"[fetch_catID] {(field, catID, extra, sdss_id)}")
-	info = data[-1].meta
-	info.cats = cats_all
+	info = evolve(data[-1].meta, cats=cats_all)
 	name = list(map(lambda x: x.name, data))
 	wave = list(map(lambda x: x.wave, data))
 	flux = list(map(lambda x: x.flux, data))
 	errs = list(map(lambda x: x.errs, data))
 	if not (info and name and wave and flux):
 		raise HTTPError(f"[fetch_catID] {(field, catID, extra, sdss_id)}")
-	r = info, name, wave, flux, errs
-	fetch_cache[_key] = r
-	return r
+	return info, name, wave, flux, errs
 
 ###
 ### Authentication
@@ -507,6 +676,10 @@ finally:
 try:
 	# raise Exception()
 	print("Verifying authentication...")
+	# ask SAS itself, as the spectrum below is likely answered from the disk cache (regardless of credentials)
+	url, _ = sdss_sas_fits(101126, 60477, 63050394846126565, "master")
+	rv = util.http_request("HEAD", util.sdss_sas_rebase(url, sas_remote), (username, password), timeout=10)
+	if rv.status_code in (401, 403): rv.raise_for_status()
 	# fetch_test = SDSSV_fetch(username, password, 15173, 59281, 4350951054)
 	# fetch_test = SDSSV_fetch(username, password, 112359, 60086, 27021600949438682)
 	fetch_test = SDSSV_fetch(username, password, 101126, 60477, 63050394846126565)
@@ -650,6 +823,37 @@ x_min = wave_min
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets,
                 title="SpecViewer", update_title="Loading...")
 
+# check for a newer bhm.json.zst upon the first request, so that only the serving process does it
+# (with `debug=True`, the reloader runs this file in a parent process which itself never serves)
+update_index_thread: None | Thread = None
+update_index_lock, update_index_started = Lock(), Event()
+
+@app.server.before_request
+def start_update_index_daemon() -> None:
+	global update_index_thread
+	if update_index_started.is_set(): return
+	with update_index_lock: # requests (e.g., for the assets of the first page) are served concurrently
+		if update_index_started.is_set(): return
+		update_index_thread = Thread(target=update_index_daemon, name="update_index", daemon=True)
+		update_index_thread.start()
+		update_index_started.set()
+
+@metrics.collect
+def cache_metrics() -> Iterator[tuple[str, dict[str, str], float]]:
+	for k, f in (("cached_fetch", cached_fetch), ("sas_listing", sas_listing), ("url_exists", url_exists)):
+		i = f.cache_info()
+		yield from (("cache_hits", dict(layer=k), i.hits), ("cache_misses", dict(layer=k), i.misses),
+			("cache_entries", dict(layer=k), i.currsize))
+	s = fetch_cache.stats()
+	yield from (("cache_hits", dict(layer="fetch_cache"), s["hits"]), ("cache_misses", dict(layer="fetch_cache"), s["miss"]),
+		("cache_entries", dict(layer="fetch_cache"), s["len"]), ("cache_bytes", dict(layer="fetch_cache"), s["size"]))
+	if sas_cache.used >= 0: yield "cache_bytes", dict(layer="sas_cache"), sas_cache.used
+
+# for scrapers (e.g., Prometheus), in the text exposition format
+@app.server.route("/metrics")
+def serve_metrics():
+	return app.server.response_class(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
 ### get object info
 ### organize by program, fieldid, catalogid
 # programname = ["COSMOS"]
@@ -671,6 +875,7 @@ app.layout = html.Div(className="container-fluid", style={"width": "90%"}, child
 	# https://dash.plotly.com/dash-core-components/store
 	dcc.Store(id="dash-user-upload", storage_type="session"),
 	dcc.Store(id="max-epochs-store", storage_type="session", data=12),
+	dcc.Store(id="spectra_plot_key"), # of the traces shown, so that `make_multiepoch_spectra` may update them in part
 
 	html.Div(className="row", children=[
 
@@ -715,7 +920,7 @@ app.layout = html.Div(className="container-fluid", style={"width": "90%"}, child
 				dcc.Dropdown(
 					id="program_dropdown",
 					options=[
-						{"label": i, "value": i} for i in [*programs.keys(), "(other)"]], # type: ignore[arg-type]
+						{"label": i, "value": i} for i in [*bhm.prg.keys(), "(other)"]], # type: ignore[arg-type]
 					placeholder="Program",
 				)]),
 
@@ -1047,6 +1252,7 @@ app.layout = html.Div(className="container-fluid", style={"width": "90%"}, child
 	Input("program_dropdown", "value"),
 	State("extra_func_list", "value"),
 	prevent_initial_call="initial_duplicate")
+@metrics.timed("callback_seconds")
 def set_input_or_dropdown(search: str, program: str, checklist: list[str]):
 	fid_mjd, catalog, redshift, sdss_id = "", "", "", ""
 	for x in search.lstrip("?").split("&"):
@@ -1065,10 +1271,10 @@ def set_input_or_dropdown(search: str, program: str, checklist: list[str]):
 	if program == "(other)" and "p" in checklist and fullmatch(r"\d+(-.*)?", fid_mjd):
 		field = int(fid_mjd.split("-", 1)[0])
 		catid = int(catalog)
-		for prog in programs:
-			if field not in programs.get(f"{prog    }", []): continue
-			if catid not in fieldIDs.get(f"{field   }", []): continue
-			if catid not in fieldIDs.get(f"{prog}-all", []): continue
+		for prog in bhm.prg:
+			if field not in bhm.prg.get(f"{prog    }", []): continue
+			if catid not in bhm.fld.get(f"{field   }", []): continue
+			if catid not in bhm.fld.get(f"{prog}-all", []): continue
 			program = prog
 
 	tt, ff = (True, True), (False, False)
@@ -1083,23 +1289,25 @@ def set_input_or_dropdown(search: str, program: str, checklist: list[str]):
 @app.callback(
 	Output("fieldid_dropdown", "options"),
 	Input("program_dropdown", "value"))
+@metrics.timed("callback_seconds")
 def set_fieldid_options(selected_program):
 	if not selected_program or selected_program == "(other)": return []
-	xs = programs.get(selected_program, []) + ["all"]
+	xs = bhm.prg.get(selected_program, []) + ["all"]
 	return [{"label": str(x), "value": str(x)} for x in xs]
 
 @app.callback(
 	Output("catalogid_dropdown", "options"),
 	Input("fieldid_dropdown", "value"),
 	Input("program_dropdown", "value"))
+@metrics.timed("callback_seconds")
 def set_catalogid_options(selected_fieldid, selected_program):
 	if not selected_program or selected_program == "(other)": return []
 	if not selected_fieldid: return []
 	# the following lines are where field numbers are obtained, use strings not numbers for both labels and values
 	if selected_fieldid == "all":
-		xs = fieldIDs.get(f"{selected_program}-{selected_fieldid}", [])
+		xs = bhm.fld.get(f"{selected_program}-{selected_fieldid}", [])
 	else:
-		xs = fieldIDs.get(f"{selected_fieldid}", [])
+		xs = bhm.fld.get(f"{selected_fieldid}", [])
 	return [{"label": str(x), "value": str(x)} for x in xs]
 
 @app.callback(
@@ -1107,6 +1315,7 @@ def set_catalogid_options(selected_fieldid, selected_program):
 	Input("fieldid_dropdown", "options"),
 	Input("fieldid_input", "value"),
 	State("program_dropdown", "value"))
+@metrics.timed("callback_seconds")
 def set_fieldid_value(options, input: str, program: str):
 	try:
 		if input and program == "(other)":
@@ -1124,6 +1333,7 @@ def set_fieldid_value(options, input: str, program: str):
 	Input("catalogid_dropdown", "options"),
 	Input("catalogid_input", "value"),
 	State("program_dropdown", "value"))
+@metrics.timed("callback_seconds")
 def set_catalogid_value(options, input: str, program: str):
 	try:
 		if input and program:
@@ -1142,6 +1352,7 @@ def set_catalogid_value(options, input: str, program: str):
 	State("redshift_input", "value"),
 	Input("redshift_step", "value"),
 	prevent_initial_call=True)
+@metrics.timed("callback_seconds")
 def set_redshift_stepping(z, step):
 	if not step: step = "any"
 	if str(step).lower() == "any":
@@ -1157,6 +1368,7 @@ def set_redshift_stepping(z, step):
 	Output("extra_obj_input", "value"),
 	Output("max-epochs-store", "data"), # PBH
 	Input("window_location", "search"))
+@metrics.timed("callback_seconds")
 def set_extra_obj(search: str):
 	extra_obj = ""
 	max_epochs = 12 # PBH
@@ -1187,6 +1399,7 @@ def set_extra_obj(search: str):
 	Input("fieldid_dropdown", "value"),
 	Input("catalogid_dropdown", "value"),
 	prevent_initial_call=True)
+@metrics.timed("callback_seconds")
 def reset_on_obj_change(y_max, y_min, x_max, x_min, z, z_step, hash: str, program: str, *_):
 	smooth = str(smooth_default)
 	if program != "(other)":
@@ -1206,6 +1419,7 @@ def reset_on_obj_change(y_max, y_min, x_max, x_min, z, z_step, hash: str, progra
 @app.callback(
 	Output("file_ul_div", "hidden"),
 	Input("extra_func_list", "value"))
+@metrics.timed("callback_seconds")
 def hide_file_upload(checklist: list[str]):
 	return "u" not in checklist
 @app.callback(
@@ -1214,6 +1428,7 @@ def hide_file_upload(checklist: list[str]):
 	Input("file_ul", "contents"),
 	Input("file_ul", "filename"),
 	Input("file_ul", "last_modified"))
+@metrics.timed("callback_seconds")
 def process_upload(sto: dict, contents: list[str], filename: list[str], timestamp: list[float]):
 	# read in spectrum from csv/tsv/wsv file for wavelength, flux, error (optional)
 	# uploading will silently fail if input has 4 columns - need to fix that for DESI
@@ -1267,11 +1482,13 @@ def process_upload(sto: dict, contents: list[str], filename: list[str], timestam
 @app.callback(
 	Output("spec_info", "hidden"),
 	Input("extra_func_list", "value"))
+@metrics.timed("callback_seconds")
 def hide_spec_info(checklist: list[str]):
 	return "z" not in checklist
 @app.callback(
 	Output("spec_info2", "hidden"),
 	Input("extra_func_list", "value"))
+@metrics.timed("callback_seconds")
 def hide_spec_info2(checklist: list[str]):
 	return "z" not in checklist or "i" not in checklist
 @app.callback(
@@ -1289,6 +1506,7 @@ def hide_spec_info2(checklist: list[str]):
 	Input("sdss_id_input", "value"),
 	Input("extra_func_list", "value"),
 	Input("max-epochs-store", "data"))
+@metrics.timed("callback_seconds")
 def show_spec_info(field_d, cat_d, field_i, cat_i, sdss_id, checklist: list[str], max_epochs: int):
 	try:
 		meta = fetch_catID(field_d or field_i, cat_d or cat_i, "", sdss_id, match_sdss_id="s" in checklist, max_epochs=max_epochs or 12)[0]
@@ -1307,6 +1525,7 @@ def show_spec_info(field_d, cat_d, field_i, cat_i, sdss_id, checklist: list[str]
 	Input("sdss_id_input", "value"),
 	Input("extra_func_list", "value"),
 	Input("max-epochs-store", "data"))
+@metrics.timed("callback_seconds")
 def show_spec_info2(field_d, cat_d, field_i, cat_i, sdss_id, checklist: list[str], max_epochs: int):
 	try:
 		meta = fetch_catID(field_d or field_i, cat_d or cat_i, "", sdss_id, match_sdss_id="s" in checklist, max_epochs=max_epochs or 12)[0]
@@ -1322,6 +1541,7 @@ def show_spec_info2(field_d, cat_d, field_i, cat_i, sdss_id, checklist: list[str
 	Input("spec_info_ra", "value"),
 	Input("spec_info_dec", "value"),
 )
+@metrics.timed("callback_seconds")
 def display_generated_links(ra: float, dec: float):
 	links = util.object_links(ra, dec) if type(ra) == type(dec) == float else []
 	return [
@@ -1336,6 +1556,7 @@ def display_generated_links(ra: float, dec: float):
 	State("line_list_emi", "value"),
 	State("line_list_emi", "options"),
 )
+@metrics.timed("callback_seconds")
 def line_list_emi_select_all(clk: int, val: list, opt: list):
 	if (clk > 0):
 		clk = 0
@@ -1350,6 +1571,7 @@ def line_list_emi_select_all(clk: int, val: list, opt: list):
 	State("line_list_abs", "value"),
 	State("line_list_abs", "options"),
 )
+@metrics.timed("callback_seconds")
 def line_list_abs_select_all(clk: int, val: list, opt: list):
 	if (clk > 0):
 		clk = 0
@@ -1357,10 +1579,21 @@ def line_list_abs_select_all(clk: int, val: list, opt: list):
 		val = all if len(val) < len(all) else []
 	return clk, val
 
+# inputs of `make_multiepoch_spectra` which change only the axes, lines, or x (by z) of the figure shown
+patchable_inputs = {"redshift_input.value", "axis_y_max.value", "axis_y_min.value", "axis_x_max.value",
+	"axis_x_min.value", "line_list_emi.value", "line_list_abs.value"}
+
+def typed_array(x: util.LogGrid | ndarray) -> dict[str, str]:
+	"""
+	The typed array (float32, base64) of plotly.js, as `Figure` would encode an array (but a `Patch` does not)
+	"""
+	return dict(dtype="f4", bdata=base64encode(numpy.asarray(x, "<f4").tobytes()).decode())
+
 ## plot the spectra
 @app.callback(
 	Output("spectra_plot", "figure"),
 	Output("redshift_input", "value"),
+	Output("spectra_plot_key", "data"),
 	Input("fieldid_dropdown", "value"),
 	Input("catalogid_dropdown", "value"),
 	Input("fieldid_input", "value"),
@@ -1379,11 +1612,13 @@ def line_list_abs_select_all(clk: int, val: list, opt: list):
 	Input("scale_input", "value"),
 	Input("extra_func_list", "value"),
 	Input("dash-user-upload", "data"),
-	Input("max-epochs-store", "data"))
+	Input("max-epochs-store", "data"),
+	State("spectra_plot_key", "data"))
 # The list of inputs above applies to the following function
+@metrics.timed("callback_seconds")
 def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift, redshift_step, sdss_id,
                             y_max, y_min, x_max, x_min, list_emi, list_abs, smooth, scale,
-                            checklist: list[str], user_data: dict, max_epochs: int):
+                            checklist: list[str], user_data: dict, max_epochs: int, key: None | list[str] = None):
 	layout_axis = dict(fixedrange=True)
 	layout = dict(yaxis=layout_axis, xaxis=layout_axis, xaxis2=layout_axis)
 	xscale, xtype = identity, "linear"
@@ -1393,7 +1628,8 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 	smooth, z = int(smooth or smooth_default), float(redshift or redshift_default)
 	if (1 + z) <= 0: z = nextfloat(-1) # z ∈ (-1, +∞)
 
-	names, waves, fluxes, scaledfluxes, delta = list[str](), list[ndarray](), list[ndarray](), list[ndarray](), list[ndarray]()
+	names, waves, fluxes, scaledfluxes, delta = list[str](), list[util.LogGrid | ndarray](), list[ndarray](), list[ndarray](), list[ndarray]()
+	observed = list[bool]() # whether each upload is shifted to the rest frame (by z)
 	if user_data:
 		for k, v in user_data.items():
 			try: #
@@ -1402,7 +1638,7 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 				if len(name) > 36: name = name[:33] + "..." # truncate name that is too long
 				if len(name) > 18: name = name[:18] + "<br />" + name[18:] # wrap to 2 lines
 				if mean(wave) <= 10: wave = 10**wave # λ
-				if median(wave) >= 5000: wave = wave / (1 + z) # consider as observed instead of rest frame
+				if (obs := median(wave) >= 5000): wave = wave / (1 + z) # consider as observed instead of rest frame
 				if len(errs) > 0:
 					if mean(errs) < 1 and median(errs) < 1 and std(errs) < 1: pass # consider as σ
 					else:
@@ -1410,6 +1646,7 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 						errs = 1 / sqrt(errs) # σ
 				# print((name, wave, flux, errs))
 				names.append(name), waves.append(wave), fluxes.append(flux), scaledfluxes.append(flux), delta.append(errs)
+				observed.append(bool(obs))
 			except: print_exc()
 	noop_size = len(names)
 
@@ -1420,8 +1657,9 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 	except Exception as e:
 		if str(e): print(f"[make_multiepoch_spectra] fetch_catID{([field_d, field_i], [cat_d, cat_i], extra_obj, sdss_id)}")
 		if str(e): print(e) if isa(e, HTTPError) else print_exc()
-		return Figure(layout=layout), z
+		return Figure(layout=layout), z, None
 
+	revision = f"{fieldid};{catalogid};{extra_obj}"
 	try:
 
 		if not y_min and not y_max: y_min, y_max = y_min_default, y_max_default
@@ -1434,26 +1672,70 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 		rest_x_max = util.cld(x_max, 1 + z)
 		rest_x_min = util.fld(x_min, 1 + z)
 
+		# Line labels for x-axis
+		def add_lines(fig: Figure) -> Figure:
+			for l in spec_line_emi: # emission
+				j, xs = l[3], l[2].split() # j is the label, xs is the wavelength list
+				labeled = False # reset labeling flag
+				if xs[0] not in list_emi: continue # skip if the transition is not in the active plotting dictionary
+				for x in (xs := list(map(float, xs))): # for each wavelength in the wavelength list
+					if (rest_x_min <= x and x <= rest_x_max):
+						fig.add_vline(x=x, line_dash="solid", opacity=1 / 4)
+						# label the first entry in the list of wavelengths
+						labeled or fig.add_annotation(x=xscale(x), y=y_max, text=j, hovertext=f" {j} ({xs} Å)", textangle=70)
+						labeled = True
+
+			for l in spec_line_abs: # absorption
+				j, xs = l[3], l[2].split() # j is the label, xs is the wavelength list
+				# j, xs, n, b = l[3], l[2].split(), l[1], bool(l[0]) # j = label, xs = wavelength list, n = multiplicity, b = 0/1
+				labeled = False # reset labeling flag
+				if xs[0] not in list_abs: continue # skip if the transition is not in the active plotting dictionary
+				for x in (xs := list(map(float, xs))): # for each wavelength in the wavelength list
+					if (rest_x_min <= x and x <= rest_x_max):
+						fig.add_vline(x=x, line_dash="dot", opacity=1 / 2)
+						# label the first entry in the list of wavelengths
+						labeled or fig.add_annotation(x=xscale(x), y=y_min, text=j, hovertext=f" {j} ({xs} Å)", textangle=70)
+						labeled = True
+			return fig
+
+		# the traces shown are the very same (see `spectra_plot_key`), and only the axes, lines (or x if z) change,
+		# so update just these (and leave the arrays of y & σ alone) instead of sending the whole figure again
+		if key == [revision, *names] and (trig := set(dash.ctx.triggered_prop_ids)) and trig <= patchable_inputs:
+			patch, lines = dash.Patch(), add_lines(Figure(layout=layout))
+			patch["layout"]["yaxis"]["range"] = [y_min, y_max]
+			patch["layout"]["xaxis"]["range"] = [xscale(rest_x_min), xscale(rest_x_max)]
+			patch["layout"]["xaxis2"]["range"] = [xscale(x_min), xscale(x_max)]
+			patch["layout"]["shapes"] = [x.to_plotly_json() for x in lines.layout.shapes]
+			patch["layout"]["annotations"] = [x.to_plotly_json() for x in lines.layout.annotations]
+			for i in range(len(names)):
+				if "redshift_input.value" not in trig: pass
+				elif i >= noop_size: patch["data"][2 * i]["x"] = typed_array(waves[i] / (1 + z))
+				elif observed[i]: patch["data"][2 * i]["x"] = typed_array(waves[i]) # shifted by the new z above
+				patch["data"][2 * i + 1]["x"] = [x_min, x_max] # the "ghost trace"
+			return patch, z, dash.no_update
+
 		fig = Figure(layout=layout)
 		fig.layout.yaxis.range = [y_min, y_max]
 		fig.layout.xaxis.range = [xscale(rest_x_min), xscale(rest_x_max)]
 		ntraces = len(names)
 		visible = "legendonly" if ntraces > 10 else True
+		# smoothing is linear, so scale afterwards; uploads are smoothed anew (as they are not reused)
+		smoothed = [util.box_smooth(x, smooth) for x in fluxes[:noop_size]] + smooth_spectra(fluxes[noop_size:], smooth)
 
 		# For each spectrum in the list
 		for i in range(ntraces):
 			kws = dict(visible=(ntraces == i + 1) or visible) # always show the last one
-			scaledfluxes[i] = fluxes[i]
+			scaledfluxes[i] = smoothed[i]
 			if fullmatch(r"allplate-\d+.*", names[i], IGNORECASE):
 				kws["line_color"] = "#606060"
-				scaledfluxes[i] = fluxes[i] * scale
+				scaledfluxes[i] = smoothed[i] * scale
 			if fullmatch(r"allFPS-\d+.*", names[i], IGNORECASE):
 				kws["line_color"] = "#000000"
-				scaledfluxes[i] = fluxes[i] * scale
+				scaledfluxes[i] = smoothed[i] * scale
 			# create trace of smoothed spectra
 			fig.add_trace(Scatter(
-				x=waves[i] if i < noop_size else waves[i] / (1 + z),
-				y=convolve(scaledfluxes[i], Box1DKernel(smooth)),
+				x=numpy.asarray(waves[i] if i < noop_size else waves[i] / (1 + z)), # materialize a grid (cached)
+				y=scaledfluxes[i],
 				error_y_width=0, error_y_thickness=1, error_y_type="data", # σ
 				error_y_array=delta[i] if delta[i].size and "e" in checklist else None,
 				name=names[i], opacity=1 / 2, mode="lines", **kws))
@@ -1462,29 +1744,7 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 				x=[x_min, x_max], y=[NaN, NaN], showlegend=False))
 		fig.data[1].xaxis = "x2" # assign the "ghost trace" to a new axis object
 
-		# Line labels for x-axis
-		for l in spec_line_emi: # emission
-			j, xs = l[3], l[2].split() # j is the label, xs is the wavelength list
-			labeled = False # reset labeling flag
-			if xs[0] not in list_emi: continue # skip if the transition is not in the active plotting dictionary
-			for x in (xs := list(map(float, xs))): # for each wavelength in the wavelength list
-				if (rest_x_min <= x and x <= rest_x_max):
-					fig.add_vline(x=x, line_dash="solid", opacity=1 / 4)
-					# label the first entry in the list of wavelengths
-					labeled or fig.add_annotation(x=xscale(x), y=y_max, text=j, hovertext=f" {j} ({xs} Å)", textangle=70)
-					labeled = True
-
-		for l in spec_line_abs: # absorption
-			j, xs = l[3], l[2].split() # j is the label, xs is the wavelength list
-			# j, xs, n, b = l[3], l[2].split(), l[1], bool(l[0]) # j = label, xs = wavelength list, n = multiplicity, b = 0/1
-			labeled = False # reset labeling flag
-			if xs[0] not in list_abs: continue # skip if the transition is not in the active plotting dictionary
-			for x in (xs := list(map(float, xs))): # for each wavelength in the wavelength list
-				if (rest_x_min <= x and x <= rest_x_max):
-					fig.add_vline(x=x, line_dash="dot", opacity=1 / 2)
-					# label the first entry in the list of wavelengths
-					labeled or fig.add_annotation(x=xscale(x), y=y_min, text=j, hovertext=f" {j} ({xs} Å)", textangle=70)
-					labeled = True
+		add_lines(fig)
 
 		fig.update_layout( # Rest wavelengths on top axis; observed wavelengths on bottom axis
 			# The xaxis1 command just displays the rest-frame axis numbers and title.
@@ -1495,11 +1755,11 @@ def make_multiepoch_spectra(field_d, cat_d, field_i, cat_i, extra_obj, redshift,
 
 		fig.update_layout(xaxis2_range=[xscale(x_min), xscale(x_max)]) # this line is necessary for some reason
 
-		fig.update_layout(uirevision=f"{fieldid};{catalogid};{extra_obj}")
+		fig.update_layout(uirevision=revision)
 
 	except: print_exc()
 
-	return fig, z
+	return fig, z, [revision, *names]
 
 
 if __name__ == "__main__":
@@ -48,6 +48,7 @@ const u_sorted(x) = issorted(x) & allunique(x)
 const zstdcat = `$exe_zstd -dcf`;
 const zstdin = `$exe_zstd -q -`;
 const zstdmt = `$exe_zstd -1 --long --zstd=strat=7,tlen=4096`;
+const zstdpatch(base) = `$zstdmt --patch-from=$base`;
 
 @kwdef struct File
 	name::String
@@ -58,17 +59,20 @@ end
 File(path) = File((basename, hdu2_nrow, filesize, unix2datetime ∘ mtime)(path)...)
 
 @kwdef struct Header
+	alle::Vector{String}       = [] # allepoch file (`field@branch`) of each code in `all`
+	base::String               = "" # date of the release `bhm.json.patch.zst` applies to
+	brch::Vector{String}       = [] # branch of each bit in `run`
 	date::DateTime             = trunc(now(UTC), Second)
 	dims::VTuple{Int64}        = ()
-	frmt::VTuple{Int64}        = (1, 0, 0)
+	frmt::VTuple{Int64}        = (1, 2, 0)
 	nrow::ODict{Symbol, Int64} = LDict()
 	proj::String               = projecthash()
 	size::Int64                = -1
 	source::Vector{File}       = []
 end
-Header(dims, nrow, size, source) = Header(; dims, nrow, size, source)
+Header(dims, nrow, size, source, brch, alle, base = "") = Header(; dims, nrow, size, source, brch, alle, base)
 
-Base.:(==)(a::Header, b::Header) = all((i -> @eval $a.$i == $b.$i), setdiff(fieldnames(Header), [:date]))
+Base.:(==)(a::Header, b::Header) = all((i -> @eval $a.$i == $b.$i), setdiff(fieldnames(Header), [:base, :date]))
 Base.cat(x::Integer, y::Integer, ::Val{5}) = flipsign((10^5)abs(x) + mod(y, 10^5), x)
 Base.isless(::Any, ::Union{Number, VersionNumber}) = (@nospecialize; Bool(0))
 Base.isless(::Union{Number, VersionNumber}, ::Any) = (@nospecialize; Bool(1))
@@ -81,6 +85,8 @@ function deser_json(::Type{File}, d::ODict)
 	File(; d...)
 end
 function deser_json(::Type{Header}, d::ODict)
+	d[:alle]   = (get(d, :alle, [])::Vector) .|> String
+	d[:brch]   = (get(d, :brch, [])::Vector) .|> String
 	d[:date]   = (d[:date]::String) |> DateTime
 	d[:dims]   = (d[:dims]::Vector...,)
 	d[:frmt]   = (d[:frmt]::Vector...,)
@@ -119,47 +125,58 @@ const cols = ODict{Symbol, DataType}(
 	# :Z            => Float32, # Redshift; assume incorrect if :ZWARNING is nonzero
 	# :ZWARNING     => Int64,   # A flag for bad z fits in place of CLASS=UNKNOWN; see bitmasks
 )
-const fits = let
+const fits, fits_all = let
 	extracts(arc::String) = run(`$exe_7zip x $arc`, devnull)
 	filename(arc::String) = readlines(`$exe_7zip l -ba -slt $arc`)[1][8:end]
 	is_arc = endswith(r"\.([7gx]z|rar|zip)")
 	is_tmp = endswith(r"\.tmp")
-	d = ODict{String, String}()
+	d, a = ODict{String, String}(), ODict{String, String}() # regular & allepoch
 	for x ∈ getfirst(!isempty, filter(isfile).([ARGS, readdir()]))
 		f = is_arc(x) ? filename(x) : x
 		contains(f, r"\bspall\b"i) || continue
-		contains(f, r"\ballepoch\b"i) && continue
-		endswith(f, r"\.fits(\.tmp)?") && (d[f] = x)
+		endswith(f, r"\.fits(\.tmp)?") && ((contains(f, r"\ballepoch"i) ? a : d)[f] = x)
 	end
-	for (k, v) ∈ d
-		is_arc(v) && (d[k] = filename(v); isfile(d[k]) || extracts(v); v = d[k])
-		is_tmp(v) && (d[k] = replace(v, r"\.tmp$" => ""); isfile(d[k]) || mv(v, d[k]))
+	for x ∈ (d, a), (k, v) ∈ x
+		is_arc(v) && (x[k] = filename(v); isfile(x[k]) || extracts(v); v = x[k])
+		is_tmp(v) && (x[k] = replace(v, r"\.tmp$" => ""); isfile(x[k]) || mv(v, x[k]))
 	end
 	isempty(d) && systemerror("*spAll*.(fits|[7gx]z)", Libc.ENOENT) # 2 No such file or directory
-	u_sort!(d.vals, by = s -> (m = match(r"\bv\d+[._]\d+[._]\d+\b", s)) |> isnothing ?
-							  "master" : VersionNumber(replace(m.match, "_" => ".")))
+	map((d, a)) do x
+		u_sort!(x.vals, by = s -> (m = match(r"\bv\d+[._]\d+[._]\d+\b", s)) |> isnothing ?
+								  "master" : VersionNumber(replace(m.match, "_" => ".")))
+	end
+end
+# the branch (RUN2D) of each spAll file, e.g., `v6_1_3` or `master`
+const branch_of(s) = (m = match(r"\bv\d+[._]\d+[._]\d+\b", s)) |> isnothing ? "master" : replace(m.match, "." => "_")
+const brch = branch_of.(fits)
+@assert allunique(brch) && length(brch) < 64
+# the allepoch file (field and branch) of each allepoch spAll file, e.g., `allepoch_apo@v6_2_1`
+const alle = map(fits_all) do s
+	m = match(r"\b(allepoch(?:_apo|_lco)?)\b"i, s)
+	string(isnothing(m) ? "allepoch" : lowercase(m[1]), "@", branch_of(s))
 end
+@assert allunique(alle)
 # FITS(fits[end])["SPALL"]
 
-const df = @time let dir = rstrip(stdpath(@__DIR__, "temp"), '/')
-	function _read(fn::String)
+const df, df_all = @time let dir = rstrip(stdpath(@__DIR__, "temp"), '/')
+	function _read(fn::String, keys::Vector{Symbol} = cols.keys)
 		f = File(fn)
 		r = @try if f == deser_json(File, "$dir/$(f.name).json")
 			@info "Loading `$fn` from cache (try)"
 			r = zstd_des("$dir/$(f.name).dat.zst")
-			@select! r $(cols.keys)
+			@select! r $(keys)
 		end
 		if isnothing(r)
 			n = FITS(f -> get(f, "SPALL", 2).ext, fn)
-			s_info("Reading `$fn[$n]` for ", length(cols), " columns")
+			s_info("Reading `$fn[$n]` for ", length(keys), " columns")
 			v = @time open(fn) do io
 				FITS(mmap(io)) do f
-					nx_cols = setdiff(cols.keys, Symbol.(colnames(f[n])))
+					nx_cols = setdiff(keys, Symbol.(colnames(f[n])))
 					@assert isempty(nx_cols) "column(s) not exist: $nx_cols"
-					map(col -> ensure_vector(read(f[n], String(col))), cols.keys)
+					map(col -> ensure_vector(read(f[n], String(col))), keys)
 				end
 			end
-			r = DataFrame(v, cols.keys, copycols = false)
+			r = DataFrame(v, keys, copycols = false)
 			unique!(@subset! r :CATALOGID .> 0)
 			zstd_ser("$dir/$(f.name).dat.zst", r)
 			write("$dir/$(f.name).json", json(f, 4))
@@ -167,12 +184,22 @@ const df = @time let dir = rstrip(stdpath(@__DIR__, "temp"), '/')
 		# write("$dir/$(f.name).tsv", r)
 		r
 	end
-	df = mapreduce(_read, vcat, fits)
+	# tag each row with (the bit of) the branch it comes from, see `dict_run`
+	df = mapreduce(vcat, enumerate(fits)) do (i, fn)
+		insertcols!(_read(fn), :BRCH => Int64(1) << (i - 1))
+	end
 	replace!(df.SDSS_ID, -999 => 0)
 	@assert all(!signbit, df.SDSS_ID)
-	unique!(df)
+	# deduplicate on the data columns, as the same row may come from several branches
+	df = @by df Not(:BRCH) :BRCH = reduce(|, :BRCH)
 	# write("$dir/df.tsv", df)
-	df
+	# tag each row of the allepoch files with the code (index) of the file, see `dict_all`
+	init = DataFrame(CATALOGID = cols[:CATALOGID][], MJD = cols[:MJD][], ALLE = Int64[])
+	df_all = mapreduce(vcat, enumerate(fits_all); init) do (i, fn)
+		@select _read(fn, [:CATALOGID, :MJD]) :CATALOGID :MJD :ALLE = i - 1
+	end
+	unique!(df_all)
+	df, df_all
 end
 # LDict(propertynames(df), eltype.(eachcol(df))) |> ODict
 
@@ -261,6 +288,35 @@ end
 # @assert u_sorted(dict_cat.keys) & all(u_sorted ∘ dropfirst, dict_cat.vals)
 # @show extrema(length, dict_cat.vals) # (2, 94)
 
+@info "Building dictionary for branches of each CATALOGID epoch"
+
+const dict_run = @time let
+	dict_of(ids::OSet{cols[:CATALOGID]}) = @chain df begin
+		@rselect :CATALOGID :FIELD_MJD = cat(:FIELD, :MJD, Val(5)) :BRCH
+		@rsubset! :CATALOGID ∈ ids
+		@by [:CATALOGID, :FIELD_MJD] :BRCH = reduce(|, :BRCH)
+		@orderby :CATALOGID :FIELD_MJD # same order as `dict_cat`
+		@by :CATALOGID :BRCH = [:BRCH]
+		LDict(_.CATALOGID, _.BRCH) |> ODict
+	end
+	s_info("Processing ", length(programs_cats), " entries")
+	dict_of(programs_cats)
+end
+@assert all(k -> length(dict_run[k]) == length(dict_cat[k]) - 1, dict_cat.keys)
+
+@info "Building dictionary for allepoch files of each CATALOGID"
+
+const dict_all = @time let
+	dict_of(ids::OSet{cols[:CATALOGID]}) = @chain df_all begin
+		@rsubset :CATALOGID ∈ ids
+		@rselect :CATALOGID :ALLE = cat(:ALLE, :MJD, Val(5)) # {code,5'MJD}
+		@by :CATALOGID :ALLE = [u_sort!(collect(:ALLE))]
+		LDict(_.CATALOGID, _.ALLE) |> ODict
+	end
+	s_info("Processing ", length(programs_cats), " entries")
+	dict_of(programs_cats) |> sort!
+end
+
 @info "Building dictionary for SDSS_ID"
 
 const dict_sid = @time let
@@ -286,18 +342,25 @@ end
 		:fld => dict_fld,
 		:sid => dict_sid,
 		:cat => dict_cat,
+		:run => dict_run,
+		:all => dict_all,
 	]
-	meta = let old = deser_json(Header, "$dir/bhm.meta.json")
+	meta, patch = let old = deser_json(Header, "$dir/bhm.meta.json")
 		row = ODict(k => length(v) for (k, v) ∈ data)
 		len = length(json(ODict(data), ~0))
-		new = Header(size(df), row, len, File.(fits))
-		new == old ? old : new
+		new = Header(size(df), row, len, File.([fits; fits_all]), brch, alle)
+		new == old ? (old, false) : !isfile("$dir/bhm.json.zst") ? (new, false) :
+		(Header(size(df), row, len, File.([fits; fits_all]), brch, alle, string(old.date)), true)
 	end
 	cd(dir) do
+		# keep the previous bhm.json as the base of a delta patch, see `bhm.json.patch.zst` below
+		patch && run(pipeline(`$zstdcat bhm.json.zst`, "bhm.base.json"))
 		# foreach((k, v)::Pair -> write("bhm-$k.json", json(v, ~0)), data)
 		write("bhm.meta.json", json(meta, 4))
 		write("bhm.json", json(ODict([:hdr => meta; data]), ~0))
 		run(`$zstdmt bhm.json -o bhm.json.zst -f`, devnull)
+		patch && run(`$(zstdpatch("bhm.base.json")) bhm.json -o bhm.json.patch.zst -f`, devnull)
+		patch && rm("bhm.base.json")
 		arg_keep || rm("bhm.json")
 	end
 end
@@ -1,4 +1,12 @@
 from .base import *
+from .cache import *
+from .fits import *
+from .grid import *
+from .index import *
 from .link import *
 from .math import *
+from .metrics import *
+from .net import *
 from .sdss import *
+from .smooth import *
+from .zstd import *
@@ -14,8 +14,9 @@
 
 import json as JSON
 from builtins import isinstance as isa
+from collections.abc import Iterator
 from pathlib import Path
-from typing import TypeVar
+from typing import Any, TextIO, TypeVar
 
 T = TypeVar("T")
 
@@ -36,6 +37,54 @@ def parse_json(x: str | bytes | bytearray):
 	with open(x, newline="") as io:
 		return JSON.load(io)
 
+def iter_json_items(io: TextIO, size: int = 2**20) -> Iterator[tuple[str, str, Any]]:
+	"""
+	Parse a JSON object of objects incrementally from `io`, yielding `(key, subkey, value)` for each member
+	of each member, so that the whole text (or object tree) is never held in memory at once.
+	"""
+	dec, buf, pos = JSON.JSONDecoder(), "", 0
+
+	def peek() -> str:
+		nonlocal buf, pos
+		while True:
+			while pos < len(buf) and buf[pos] in " \t\r\n": pos += 1
+			if pos < len(buf): return buf[pos]
+			if not (buf := io.read(size)): return ""
+			pos = 0
+
+	def take(c: str) -> None:
+		nonlocal pos
+		if peek() != c: raise JSON.JSONDecodeError(f"Expecting {c!r}", buf, pos)
+		pos += 1
+
+	def value() -> Any:
+		nonlocal buf, pos
+		peek()
+		while True:
+			try:
+				x, end = dec.raw_decode(buf, pos)
+				if end < len(buf): # otherwise, a number or literal might be truncated
+					pos = end
+					return x
+			except JSON.JSONDecodeError: pass
+			if not (s := io.read(size)):
+				x, pos = dec.raw_decode(buf, pos)
+				return x
+			buf, pos = buf[pos:] + s, 0
+
+	def keys() -> Iterator[str]: # the caller must consume the value after each key
+		take("{")
+		while peek() != "}":
+			k = value()
+			take(":")
+			yield k
+			if peek() != "}": take(",")
+		take("}")
+
+	for k in keys():
+		for k2 in keys():
+			yield k, k2, value()
+
 def write(f: Path | str, x: bytes | str) -> int:
 	if isa(x, bytes):
 		with open(f, "wb") as io:
@@ -1,4 +1,6 @@
-from .base import Path, identity, isa, isfile, parse_json, write
+from io import StringIO
+
+from .base import Path, identity, isa, isfile, iter_json_items, parse_json, write
 
 
 def testset_base() -> None:
@@ -11,3 +13,8 @@ def testset_base() -> None:
 	assert write("temp/.gitignore", b"\n*\n") == 3
 	assert write("temp/.gitignore", f"\n*\n") == 3
 
+def testset_json_items() -> None:
+	s = '{"hdr": {"date": "x", "nrow": {"cat": 2}}, "prg": {}, "cat": {"1": [0, 12345], "2": [-1]}}'
+	xs = [("hdr", "date", "x"), ("hdr", "nrow", {"cat": 2}), ("cat", "1", [0, 12345]), ("cat", "2", [-1])]
+	assert list(iter_json_items(StringIO(s), 1)) == xs
+	assert list(iter_json_items(StringIO(s), 9)) == xs
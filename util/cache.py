@@ -0,0 +1,196 @@
+import json as JSON
+import os
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from hashlib import sha256
+from math import nan as NaN
+from pathlib import Path
+from sys import getsizeof
+from threading import Lock
+from time import time, time_ns
+from typing import Any
+
+from numpy import ndarray
+from pyzstd import ZstdError, compress, decompress
+
+from .base import T, isa
+
+DISK_CACHE_LOW = 0.9 # low-water mark of eviction, as a ratio of the size
+
+class DiskCache:
+	"""
+	A persistent, content-addressed cache of bytes (e.g., FITS files keyed by their URL), stored as zstd
+	files under `root`. Reads bump the access time, and writes evict the least recently used entries once
+	the total size exceeds `size` (in bytes), down to `DISK_CACHE_LOW` of it, so that the cache is rescanned
+	only once in a while. The modification time of an entry is its time of writing.
+	"""
+	__slots__ = ("root", "size", "used", "lock")
+
+	def __init__(self, root: Path | str, size: int) -> None:
+		self.root, self.size, self.used, self.lock = Path(root), size, -1, Lock()
+
+	def path(self, key: str) -> Path:
+		h = sha256(key.encode()).hexdigest()
+		return self.root / h[:2] / f"{h}.zst"
+
+	def get(self, key: str, ttl: None | float = None) -> None | bytes:
+		"""
+		The cached bytes of `key`, or `None` if missing, corrupt, or written more than `ttl` seconds ago.
+		"""
+		f = self.path(key)
+		try:
+			s = f.stat()
+			if ttl is not None and time() - s.st_mtime > ttl: return None
+			with open(f, "rb") as io: data = decompress(io.read())
+			os.utime(f, ns=(time_ns(), s.st_mtime_ns)) # LRU by access time
+		except (OSError, ZstdError):
+			return None
+		return data
+
+	def put(self, key: str, data: bytes, level: int = 3) -> None:
+		f = self.path(key)
+		f.parent.mkdir(parents=True, exist_ok=True)
+		blob = compress(data, level)
+		with open(tmp := f"{f}.{os.getpid()}.tmp", "wb") as io: io.write(blob)
+		os.replace(tmp, f)
+		with self.lock: # approximate (overwrites are counted twice) until the next scan
+			if self.used >= 0: self.used += len(blob)
+		self.evict()
+
+	def entries(self) -> list[tuple[int, int, Path]]:
+		"""
+		All entries as `(atime_ns, size, path)`, least recently used first.
+		"""
+		ret: list[tuple[int, int, Path]] = []
+		for f in self.root.glob("??/*.zst"):
+			try: s = f.stat()
+			except OSError: continue
+			ret.append((s.st_atime_ns, s.st_size, f))
+		return sorted(ret)
+
+	def evict(self) -> None:
+		with self.lock:
+			if 0 <= self.used <= self.size: return
+			xs = self.entries()
+			self.used = sum(x[1] for x in xs)
+			for _, n, f in xs:
+				if self.used <= self.size * DISK_CACHE_LOW: break
+				f.unlink(missing_ok=True)
+				self.used -= n
+
+class MissCache:
+	"""
+	A persistent set of keys (e.g., `(field, mjd, obj, branch)` of missing spectra), each with an expiry,
+	stored as an append-only JSON lines file of `[key, expiry]`, which is compacted upon loading.
+	"""
+	__slots__ = ("file", "data", "lock")
+
+	def __init__(self, file: Path | str) -> None:
+		self.file, self.data, self.lock = Path(file), dict[tuple, float](), Lock()
+		lines = 0
+		try:
+			with open(self.file, encoding="utf-8") as io:
+				for s in io:
+					lines += 1
+					try: k, t = JSON.loads(s)
+					except ValueError: continue # truncated by a crash
+					self.data[tuple(k)] = max(t, self.data.get(tuple(k), t))
+		except OSError:
+			pass
+		now = time()
+		self.data = {k: t for k, t in self.data.items() if t > now}
+		if lines > 2 * len(self.data) + 64: self.compact()
+
+	def compact(self) -> None:
+		self.file.parent.mkdir(parents=True, exist_ok=True)
+		with self.lock, open(tmp := f"{self.file}.{os.getpid()}.tmp", "w", encoding="utf-8") as io:
+			io.writelines(JSON.dumps([k, t]) + "\n" for k, t in self.data.items())
+		os.replace(tmp, self.file)
+
+	def add(self, key: tuple, ttl: float) -> None:
+		self.data[key] = t = time() + ttl
+		self.file.parent.mkdir(parents=True, exist_ok=True)
+		with self.lock, open(self.file, "a", encoding="utf-8") as io:
+			io.write(JSON.dumps([key, t]) + "\n")
+
+	def __contains__(self, key: object) -> bool:
+		return isa(key, tuple) and self.data.get(key, 0) > time()
+
+class SingleFlight:
+	"""
+	Coalesce concurrent calls by key: the first caller runs the function, and the others (with the same key)
+	wait for and share its result or exception. Keys are dropped once their call returns.
+	"""
+	__slots__ = ("calls", "lock")
+
+	def __init__(self) -> None:
+		self.calls, self.lock = dict[Hashable, Future](), Lock()
+
+	def __call__(self, key: Hashable, func: Callable[..., T], *args) -> T:
+		with self.lock:
+			if lead := (f := self.calls.get(key)) is None:
+				f = self.calls[key] = Future()
+		if not lead: return f.result()
+		try:
+			f.set_result(r := func(*args))
+			return r
+		except BaseException as e:
+			f.set_exception(e)
+			raise
+		finally:
+			with self.lock: del self.calls[key]
+
+def nbytes(x: Any) -> int:
+	"""
+	The (approximate) memory size of `x`, counting the buffers of `ndarray`s within tuples, lists, and dicts.
+	"""
+	if isa(x, ndarray): return x.nbytes + 128
+	if isa(x, (tuple, list)): return sum(map(nbytes, x)) + 8 * len(x) + 64
+	if isa(x, dict): return sum(nbytes(k) + nbytes(v) for k, v in x.items()) + 64
+	return getsizeof(x)
+
+class ByteLRU:
+	"""
+	A thread-safe in-memory LRU cache, which charges each entry by `nbytes` and evicts the least recently
+	used entries once the total exceeds `size` (in bytes).
+	"""
+	__slots__ = ("data", "size", "used", "hits", "miss", "lock")
+
+	def __init__(self, size: int) -> None:
+		self.data, self.size, self.used = OrderedDict[Hashable, tuple[Any, int]](), size, 0
+		self.hits, self.miss, self.lock = 0, 0, Lock()
+
+	def get(self, key: Hashable, default: Any = None) -> Any:
+		with self.lock:
+			if (x := self.data.get(key)) is None:
+				self.miss += 1
+				return default
+			self.hits += 1
+			self.data.move_to_end(key)
+			return x[0]
+
+	def __setitem__(self, key: Hashable, value: Any) -> None:
+		n = nbytes(value)
+		with self.lock:
+			if (x := self.data.pop(key, None)) is not None: self.used -= x[1]
+			if n > self.size: return # never fits
+			self.data[key], self.used = (value, n), self.used + n
+			while self.used > self.size:
+				self.used -= self.data.popitem(last=False)[1][1]
+
+	def __contains__(self, key: object) -> bool:
+		return key in self.data
+
+	def __len__(self) -> int:
+		return len(self.data)
+
+	def clear(self) -> None:
+		with self.lock:
+			self.data.clear()
+			self.used = 0
+
+	def stats(self) -> dict[str, Any]:
+		n = self.hits + self.miss
+		return dict(len=len(self.data), size=self.used, hits=self.hits, miss=self.miss,
+			ratio=self.hits / n if n else NaN)
@@ -0,0 +1,77 @@
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import sleep
+
+import numpy
+
+from .cache import DISK_CACHE_LOW, ByteLRU, DiskCache, MissCache, SingleFlight, nbytes
+
+
+def testset_cache() -> None:
+	shutil.rmtree("temp/cache", ignore_errors=True)
+	c = DiskCache("temp/cache", 2**20)
+	assert c.get("a") is None
+	c.put("a", b"x" * 100)
+	assert c.get("a") == b"x" * 100
+	assert c.get("a", ttl=60) == b"x" * 100
+	assert c.get("a", ttl=-1) is None # expired
+	assert c.path("a") != c.path("b")
+
+def testset_cache_evict() -> None:
+	shutil.rmtree("temp/cache", ignore_errors=True)
+	c = DiskCache("temp/cache", 0)
+	c.put("a", b"a")
+	assert c.entries() == [] # over budget
+	data = [bytes(range(256)) * 64 * i for i in range(1, 4)]
+	c = DiskCache("temp/cache", 2**20)
+	for k, v in zip("abc", data): c.put(k, v)
+	assert [c.get(k) for k in "abc"] == data
+	c.get("a") # most recently used
+	c.size = sum(x[1] for x in c.entries())
+	c.put("d", b"d")
+	assert [c.get(k) is not None for k in "abcd"] == [True, False, True, True]
+	assert c.used == sum(x[1] for x in c.entries()) <= c.size * DISK_CACHE_LOW # with room for more
+
+def testset_miss() -> None:
+	Path("temp/miss.jsonl").unlink(missing_ok=True)
+	c = MissCache("temp/miss.jsonl")
+	assert ("1", 2, "3", "master") not in c
+	c.add(("1", 2, "3", "master"), 60)
+	c.add(("1", 2, "3", "v6_2_1"), -1) # expired
+	assert ("1", 2, "3", "master") in c
+	assert ("1", 2, "3", "v6_2_1") not in c
+	c = MissCache("temp/miss.jsonl") # reload
+	assert ("1", 2, "3", "master") in c
+	assert ("1", 2, "3", "v6_2_1") not in c
+	assert "x" not in c
+
+def testset_flight() -> None:
+	flight, calls = SingleFlight(), list[int]()
+	def f(x: int) -> int:
+		calls.append(x)
+		sleep(0.1)
+		return x * 2
+	def call(_: int) -> int:
+		return flight("k", f, 21)
+	with ThreadPoolExecutor(4) as pool:
+		rs = list(pool.map(call, range(4)))
+	assert rs == [42] * 4 and calls == [21]
+	assert not flight.calls
+	try: flight("k", int, "x")
+	except ValueError: pass
+	else: assert False
+
+def testset_lru() -> None:
+	c = ByteLRU(3000)
+	a, b = numpy.zeros(100), numpy.zeros(200) # 800 & 1600 bytes
+	assert 800 < nbytes((a,)) < 1100 and nbytes([a, b]) > 2400
+	c["a"], c["b"] = (a,), (b,)
+	assert c.get("a") is not None and c.get("x") is None
+	c["c"] = (a,) # evicts "b", the least recently used
+	assert "a" in c and "b" not in c and "c" in c and len(c) == 2
+	c["d"] = numpy.zeros(999) # never fits
+	assert "d" not in c and c.used <= c.size
+	assert c.stats()["hits"] == 1 and c.stats()["miss"] == 1 and c.stats()["ratio"] == 0.5
+	c.clear()
+	assert len(c) == 0 and c.used == 0
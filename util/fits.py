@@ -0,0 +1,140 @@
+from collections.abc import Callable, Iterator
+from math import prod
+from re import fullmatch, match
+from typing import Any, cast
+
+import numpy
+from numpy import ndarray
+
+from .base import isa
+
+FitsBuffer = bytes | bytearray | memoryview | ndarray
+
+FITS_BLOCK = 2880
+FITS_CARD = 80
+
+def fits_card_value(s: str) -> Any:
+	if m := match(r"\s*'((?:[^']|'')*)'", s): # string, with '' as an escaped quote
+		return m[1].replace("''", "'").rstrip()
+	s = s.split("/", 1)[0].strip()
+	if s in ("T", "F"): return s == "T"
+	try: return int(s)
+	except ValueError: pass
+	try: return float(s.replace("D", "E"))
+	except ValueError: return s
+
+def fits_header(buf: FitsBuffer, offset: int = 0) -> None | tuple[dict[str, Any], int]:
+	"""
+	Parse the header starting at `offset` of `buf` into a dict of keywords (values only), along with the offset
+	where the header ends (i.e., where the data starts), or return `None` if `buf` ends before the `END` card.
+	"""
+	head: dict[str, Any] = {}
+	for pos in range(offset, len(buf) - FITS_CARD + 1, FITS_CARD):
+		card = bytes(buf[pos:pos + FITS_CARD]).decode("ascii", "replace")
+		key = card[:8].rstrip()
+		if key == "END":
+			end = pos + FITS_CARD
+			return head, end + -(end - offset) % FITS_BLOCK
+		if card[8:10] == "= " and key not in head: head[key] = fits_card_value(card[10:])
+	return None
+
+def fits_data_size(head: dict[str, Any]) -> int:
+	"""
+	The size (padded to blocks) of the data (including the heap) of an HDU, given its header.
+	"""
+	if not (n := head.get("NAXIS", 0)): return 0
+	size = abs(head["BITPIX"]) // 8 * head.get("GCOUNT", 1) * \
+		(head.get("PCOUNT", 0) + prod(head[f"NAXIS{i}"] for i in range(1, n + 1)))
+	return size + -size % FITS_BLOCK
+
+def fits_prefix(read: Callable[[int, int], bytes], hdus: int, chunk: int = 2**16) -> bytes:
+	"""
+	Read the first `hdus` HDUs of a FITS file (as a valid FITS file itself), where `read(start, stop)` returns
+	the bytes in the range (e.g., by HTTP range requests), reading ahead by `chunk` bytes to include headers.
+	"""
+	buf = bytearray()
+
+	def need(n: int, ahead: int = chunk) -> None:
+		if n > len(buf): buf.extend(read(len(buf), n + ahead))
+		if n > len(buf): raise EOFError(f"FITS file truncated at {len(buf)} bytes")
+
+	pos = 0
+	for i in range(hdus):
+		while (h := fits_header(buf, pos)) is None:
+			need(len(buf) + FITS_BLOCK)
+		head, pos = h
+		pos += fits_data_size(head)
+		need(pos, chunk if i < hdus - 1 else 0)
+	return bytes(buf[:pos])
+
+FITS_TFORM = dict(L="u1", X="u1", B="u1", I=">i2", J=">i4", K=">i8", A="S", E=">f4", D=">f8", C=">c8", M=">c16",
+	P=">i4", Q=">i8")
+
+def fits_hdus(buf: FitsBuffer) -> Iterator[tuple[dict[str, Any], int]]:
+	"""
+	The headers of the HDUs in `buf`, each along with the offset where its data starts.
+	"""
+	pos = 0
+	while pos < len(buf) and (h := fits_header(buf, pos)) is not None:
+		yield h
+		pos = h[1] + fits_data_size(h[0])
+
+def fits_dtype(head: dict[str, Any]) -> numpy.dtype:
+	"""
+	The (big-endian) dtype of the rows of a binary table, with the columns named by `TTYPEn` in upper case.
+	"""
+	names, formats, offsets, pos = list[str](), list[Any](), list[int](), 0
+	for i in range(1, head["TFIELDS"] + 1):
+		if not (m := fullmatch(r"\s*(\d*)([A-Z])(.*)", head[f"TFORM{i}"])) or m[2] not in FITS_TFORM:
+			raise ValueError(f"[fits_dtype] unsupported TFORM{i} = {head[f'TFORM{i}']!r}")
+		r, c = int(m[1] or 1), m[2]
+		t, n = FITS_TFORM[c], (r + 7) // 8 if c == "X" else 2 * min(r, 1) if c in "PQ" else r
+		fmt = f"S{r}" if c == "A" else t if n == 1 else (t, (n,))
+		name = str(head.get(f"TTYPE{i}", "")).strip().upper() or f"COL{i}"
+		if n and name not in names:
+			names.append(name)
+			formats.append(fmt)
+			offsets.append(pos)
+		pos += numpy.dtype(t).itemsize * n if c != "A" else r
+	return numpy.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": head["NAXIS1"]})
+
+def fits_table(buf: FitsBuffer, *hdus: int | str) -> None | dict[str, ndarray]:
+	"""
+	The columns (by upper-case name) of the first binary table found of `hdus` (each an index or `EXTNAME`)
+	in the FITS file `buf`, as (big-endian) views over `buf` without copying, or `None` if none is found.
+	Only scaled (`TSCALn`/`TZEROn`) and logical columns are converted (i.e., copied).
+	"""
+	xs = list(fits_hdus(buf))
+	for hdu in hdus:
+		if isa(hdu, str): hdu = next((i for i, (h, _) in enumerate(xs) if str(h.get("EXTNAME", "")).strip() == hdu), -1)
+		if 0 <= hdu < len(xs): break
+	else:
+		return None
+	head, pos = xs[hdu]
+	if head.get("XTENSION") != "BINTABLE": raise ValueError(f"[fits_table] not a binary table: HDU {hdu}")
+	dtype = fits_dtype(head)
+	rows = numpy.frombuffer(buf, dtype, head["NAXIS2"], pos)
+	cols = {k: rows[k] for k in cast(tuple, dtype.names)}
+	for i in range(1, head["TFIELDS"] + 1):
+		if (k := str(head.get(f"TTYPE{i}", "")).strip().upper()) not in cols: continue
+		if head[f"TFORM{i}"].strip().endswith("L"): cols[k] = cols[k] == ord("T")
+		a, b = head.get(f"TSCAL{i}", 1), head.get(f"TZERO{i}", 0)
+		if a == 1 and b == 0: continue
+		x, n = cols[k], cols[k].dtype.itemsize
+		if a == 1 and x.dtype.kind == "i" and b == 2 ** (8 * n - 1): # unsigned, stored as signed
+			cols[k] = x.view(f">u{n}") ^ numpy.array(b, f">u{n}")
+		elif a == 1 and x.dtype.kind == "u" and b == -128: # signed bytes, stored as unsigned
+			cols[k] = (x ^ numpy.uint8(128)).view("i1")
+		else:
+			cols[k] = x * a + b
+	return cols
+
+def fits_scalars(cols: dict[str, ndarray], row: int = 0) -> dict[str, Any]:
+	"""
+	The values of a row of `cols` (see `fits_table`) as Python scalars (and strings, trimmed), or arrays (copied).
+	"""
+	ret: dict[str, Any] = {}
+	for k, x in cols.items():
+		v = x[row]
+		ret[k] = v.decode("ascii", "replace").strip() if isa(v, bytes) else v.copy() if isa(v, ndarray) else v.item()
+	return ret
@@ -0,0 +1,73 @@
+from io import BytesIO as IOBuffer
+
+import numpy
+from astropy.io import fits # type: ignore[import-untyped]
+
+from .base import isa
+from .fits import fits_card_value, fits_data_size, fits_header, fits_hdus, fits_prefix, fits_scalars, fits_table
+
+
+def testset_card() -> None:
+	assert fits_card_value(" 'COADD   '           / extension name") == "COADD"
+	assert fits_card_value(" 'it''s'") == "it's"
+	assert fits_card_value("                    8 / bits") == 8
+	assert fits_card_value("                    T") == True
+	assert fits_card_value("               1.5D2 ") == 150.0
+
+def testset_prefix() -> None:
+	def col(n: int, name: str) -> fits.BinTableHDU:
+		return fits.BinTableHDU.from_columns([fits.Column("X", "E", array=numpy.arange(n))], name=name)
+	hdus = fits.HDUList([fits.PrimaryHDU(), col(3000, "COADD"), col(1, "SPALL"), col(5000, "ZALL")])
+	io = IOBuffer()
+	hdus.writeto(io)
+	data, reads = io.getvalue(), list[tuple[int, int]]()
+	with fits.open(IOBuffer(data)) as f: end3 = (f.fileinfo(3) or {})["hdrLoc"]
+	def read(a: int, b: int) -> bytes:
+		reads.append((a, b))
+		return data[a:b]
+	head, end = fits_header(data, 0) or ({}, 0)
+	assert head["SIMPLE"] == True and end == 2880 and fits_data_size(head) == 0
+	assert fits_header(data[:80]) is None
+	for chunk in (0, 2880, 2**16):
+		reads.clear()
+		x = fits_prefix(read, 3, chunk)
+		assert x == data[:end3]
+		assert all(b - a > 0 for a, b in reads)
+		with fits.open(IOBuffer(x)) as f:
+			assert [h.name if isa(h, (fits.PrimaryHDU, fits.BinTableHDU)) else None for h in f] == ["PRIMARY", "COADD", "SPALL"]
+			assert isa(h := f["COADD"], fits.BinTableHDU) and h.data["X"][-1] == 2999
+	assert fits_prefix(read, 4) == data
+	try: fits_prefix(read, 5)
+	except EOFError: pass
+	else: assert False
+
+def testset_table() -> None:
+	n = 100
+	coadd = fits.BinTableHDU.from_columns([
+		fits.Column("loglam", "E", array=numpy.linspace(3.5, 4, n)), fits.Column("FLUX", "E", array=numpy.arange(n)),
+		fits.Column("AND_MASK", "J", array=numpy.arange(n)), fits.Column("X", "3D", array=numpy.ones((n, 3))),
+	], name="COADD")
+	spall = fits.BinTableHDU.from_columns([
+		fits.Column("CATALOGID", "K", bzero=2**63, array=numpy.array([2**63 + 5], numpy.uint64)), fits.Column("RUN2D", "16A", array=["v6_2_1"]),
+		fits.Column("OBS", "3A", array=["APO"]), fits.Column("Z", "D", array=[1.5]), fits.Column("OK", "L", array=[True]),
+		fits.Column("BITS", "12X", array=[numpy.ones(12, bool)]), fits.Column("B", "B", bzero=-128, array=numpy.array([-100], numpy.int8)),
+	], name="SPALL")
+	io = IOBuffer()
+	fits.HDUList([fits.PrimaryHDU(), coadd, spall]).writeto(io)
+	data = io.getvalue()
+	assert [h.get("EXTNAME") for h, _ in fits_hdus(data)] == [None, "COADD", "SPALL"]
+	assert fits_table(data, "ZALL") is None and fits_table(data, 3) is None
+	assert fits_table(data, "ZALL", 1) is not None
+	try: fits_table(data, 0)
+	except ValueError: pass
+	else: assert False
+	with fits.open(IOBuffer(data)) as f:
+		assert isa(c := f["COADD"], fits.BinTableHDU) and isa(s := f["SPALL"], fits.BinTableHDU)
+		cols = fits_table(data, "COADD") or {}
+		assert list(cols) == ["LOGLAM", "FLUX", "AND_MASK", "X"]
+		for k in cols: assert numpy.array_equal(cols[k], c.data.field(k))
+		assert not cols["FLUX"].flags.writeable and cols["FLUX"].base is not None # a view
+		meta = fits_scalars(fits_table(data, "SPALL") or {})
+		assert meta["CATALOGID"] == 2**63 + 5 == s.data["CATALOGID"][0]
+		assert meta["RUN2D"] == "v6_2_1" and meta["OBS"] == "APO" and meta["Z"] == 1.5 and meta["OK"] is True
+		assert meta["B"] == -100 == s.data["B"][0] and list(meta["BITS"]) == [255, 240]
@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from math import log10
+from typing import Any
+
+import numpy
+from numpy import ndarray
+
+
+@dataclass(frozen=True, slots=True)
+class LogGrid:
+	"""
+	A uniform grid in lg(λ) of `n` pixels, i.e., `λ = 10**(lg0 + dlg * arange(n))`, as of SDSS/BOSS coadds,
+	which stands in for the array of λ (materialized upon `numpy.asarray`, and shared among equal grids).
+	"""
+	lg0: float
+	dlg: float
+	n: int
+
+	@staticmethod
+	def of(loglam: ndarray, atol: float = 1e-6) -> "None | LogGrid":
+		"""
+		The grid of the lg(λ) array `loglam` (with `lg0` & `dlg` rounded, to absorb the float32 error, so that
+		grids of the same start & step compare equal), or `None` if it is not uniform within `atol`.
+		"""
+		if (n := len(loglam)) < 2: return None
+		x = LogGrid(round(float(loglam[0]), 6), round(float(loglam[-1] - loglam[0]) / (n - 1), 8), n)
+		return x if numpy.allclose(loglam, x.loglam(), rtol=0, atol=atol) else None
+
+	def loglam(self) -> ndarray:
+		return self.lg0 + self.dlg * numpy.arange(self.n)
+
+	@property
+	def wave(self) -> ndarray:
+		return loggrid_wave(self)
+
+	def __array__(self, dtype: Any = None, copy: None | bool = None) -> ndarray:
+		return self.wave if dtype is None and not copy else numpy.array(self.wave, dtype)
+
+	def __len__(self) -> int:
+		return self.n
+
+	def __truediv__(self, x: float) -> "LogGrid":
+		return LogGrid(self.lg0 - log10(x), self.dlg, self.n) # e.g., to the rest frame
+
+@lru_cache(64)
+def loggrid_wave(grid: LogGrid) -> ndarray:
+	"""
+	The (read-only, float32) array of λ of `grid`, cached.
+	"""
+	wave = (10**grid.loglam()).astype(numpy.float32)
+	wave.flags.writeable = False
+	return wave
@@ -0,0 +1,18 @@
+import numpy
+
+from .grid import LogGrid, loggrid_wave
+
+
+def testset_grid() -> None:
+	loglam = numpy.float32(3.5523) + numpy.float32(1e-4) * numpy.arange(4648, dtype=numpy.float32)
+	g = LogGrid.of(loglam)
+	assert g is not None
+	assert g == LogGrid(3.5523, 1e-4, 4648) and len(g) == 4648
+	assert LogGrid.of(loglam[1:]) == LogGrid(3.5524, 1e-4, 4647)
+	assert LogGrid.of(numpy.r_[loglam[:10], loglam[11:]]) is None # a gap
+	assert LogGrid.of(loglam[:1]) is None
+	wave = numpy.asarray(g)
+	assert wave is loggrid_wave(LogGrid(3.5523, 1e-4, 4648)) and not wave.flags.writeable
+	assert numpy.allclose(wave, 10**loglam, rtol=1e-6) and wave.dtype == numpy.float32
+	assert numpy.allclose(numpy.asarray(g / 2), 10**loglam / 2, rtol=1e-6)
+	assert numpy.asarray(g, numpy.float64).dtype == numpy.float64
@@ -0,0 +1,184 @@
+import json as JSON
+import os
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from re import fullmatch
+from typing import Any
+
+import numpy
+from numpy import ndarray
+
+from .base import isa
+
+# file layout: magic, u64 header length, header (JSON), then 64-byte aligned column blobs
+INDEX_MAGIC = b"BHMIDX\x00\x02" # bumped upon any change of the layout (e.g., the tables)
+INDEX_ALIGN = 64
+INDEX_TABLES = ("fld", "sid", "cat", "run", "all") # others (`hdr`, `prg`) are kept in the header
+
+class Table(Mapping[str, list[int]]):
+	"""
+	A read-only mapping of sorted keys to integer lists, stored as CSR arrays (`key`, `ptr`, `val`),
+	where the values of `key[i]` are `val[ptr[i]:ptr[i+1]]`. Keys are looked up with `searchsorted`.
+	"""
+	__slots__ = ("key", "ptr", "val")
+
+	def __init__(self, key: ndarray, ptr: ndarray, val: ndarray) -> None:
+		self.key, self.ptr, self.val = key, ptr, val
+
+	def find(self, k: Any) -> int:
+		if self.key.dtype.kind == "i":
+			if isa(k, str) and fullmatch(r"-?\d+", k): k = int(k)
+			if not isa(k, int): return -1
+		elif not isa(k, str): return -1
+		i = int(numpy.searchsorted(self.key, k))
+		return i if i < len(self.key) and self.key[i] == k else -1
+
+	def __getitem__(self, k: Any) -> list[int]:
+		if (i := self.find(k)) < 0: raise KeyError(k)
+		return self.val[self.ptr[i]:self.ptr[i + 1]].tolist()
+
+	def __contains__(self, k: object) -> bool:
+		return self.find(k) >= 0
+
+	def __iter__(self) -> Iterator[str]:
+		return map(str, self.key.tolist())
+
+	def __len__(self) -> int:
+		return len(self.key)
+
+@dataclass(frozen=True)
+class BhmIndex:
+	hdr: dict[str, Any]
+	prg: dict[str, list[int]]
+	fld: Table
+	sid: Table
+	cat: Table
+	run: Table # bitmask of the branches (`hdr["brch"]`) of each `cat` epoch, i.e., aligned with `cat[k][1:]`
+	all: Table # allepoch files of each catalog ID as {code,5'MJD}, where `hdr["alle"][code]` is `field@branch`
+	stamp: dict[str, int]
+
+	def branches(self, field: int, mjd: int, cat: int | str) -> None | list[str]:
+		"""
+		The branches (newest first) in which the spectrum `(field, mjd, cat)` exists, or `None` if unknown.
+		"""
+		if not (names := self.hdr.get("brch")) or (i := self.run.find(cat)) < 0: return None
+		epochs, masks = self.cat[cat][1:], self.run.val[self.run.ptr[i]:self.run.ptr[i + 1]].tolist()
+		if len(epochs) != len(masks) or (k := field * 10**5 + mjd % 10**5) not in epochs: return None
+		m = masks[epochs.index(k)]
+		return [v for b, v in reversed(list(enumerate(names))) if m >> b & 1]
+
+	def allepochs(self, mjd: int, cat: int | str) -> None | list[tuple[str, str]]:
+		"""
+		The allepoch files `(field, branch)` of `(mjd, cat)`, or `None` if unknown (i.e., not in the index).
+		"""
+		if not (names := self.hdr.get("alle")) or self.cat.find(cat) < 0: return None
+		ret = list[tuple[str, str]]()
+		for x in self.all.get(str(cat), []):
+			c, m = divmod(x, 10**5)
+			if m != mjd % 10**5: continue
+			field, branch = names[c].split("@", 1)
+			ret.append((field, branch))
+		return ret
+
+def filestamp(f: Path | str) -> dict[str, int]:
+	"""
+	A cheap validity stamp of a file, i.e., its size and modification time (in ns).
+	"""
+	s = os.stat(f)
+	return dict(size=s.st_size, time=s.st_mtime_ns)
+
+class TableBuilder:
+	"""
+	Accumulate the entries of a `Table` in compact arrays, in any order.
+	"""
+	__slots__ = ("key", "len", "val")
+
+	def __init__(self) -> None:
+		self.key: array[int] | list[str] = array("q")
+		self.len: array[int] = array("q")
+		self.val: array[int] = array("q")
+
+	def append(self, k: str, v: list[int]) -> None:
+		if isa(self.key, array) and not k.lstrip("-").isdigit():
+			self.key = list(map(str, self.key)) # not all keys are integers
+		if isa(self.key, array): self.key.append(int(k))
+		else: self.key.append(k)
+		self.len.append(len(v))
+		self.val.extend(v)
+
+	def build(self) -> tuple[ndarray, ndarray, ndarray]:
+		key = numpy.asarray(self.key, numpy.int64 if isa(self.key, array) else str)
+		num = numpy.asarray(self.len, numpy.int64)
+		val = numpy.asarray(self.val, numpy.int64)
+		idx = numpy.argsort(key, kind="stable")
+		src = numpy.cumsum(num) - num # start of each entry in `val`
+		ptr = numpy.zeros(num.size + 1, numpy.int64)
+		numpy.cumsum(num[idx], out=ptr[1:])
+		pos = numpy.repeat(src[idx] - ptr[:-1], num[idx]) + numpy.arange(ptr[-1])
+		return key[idx], ptr, val[pos]
+
+def json_items(data: Mapping[str, Mapping[str, Any]]) -> Iterator[tuple[str, str, Any]]:
+	return ((k, k2, v) for k, d in data.items() for k2, v in d.items())
+
+def build_index(f: Path | str, items: Iterable[tuple[str, str, Any]], stamp: dict[str, int]) -> None:
+	"""
+	Convert the `bhm.json` dictionaries, given as `(key, subkey, value)` items (see `iter_json_items`),
+	into a columnar index file, replacing `f` atomically.
+	"""
+	data: dict[str, dict[str, Any]] = dict(hdr={}, prg={})
+	tabs = {k: TableBuilder() for k in INDEX_TABLES}
+	for k, k2, v in items:
+		if k in tabs: tabs[k].append(k2, v)
+		else: data.setdefault(k, {})[k2] = v
+	cols: dict[str, ndarray] = {}
+	for name, tab in tabs.items():
+		cols[f"{name}.key"], cols[f"{name}.ptr"], cols[f"{name}.val"] = tab.build()
+	del tabs
+	head: dict[str, Any] = dict(hdr=data["hdr"], prg=data["prg"], stamp=stamp, cols={})
+	offset = 0
+	for k, v in cols.items():
+		head["cols"][k] = dict(dtype=v.dtype.str, shape=v.shape, offset=offset)
+		offset += -(-v.nbytes // INDEX_ALIGN) * INDEX_ALIGN
+	blob = JSON.dumps(head, separators=(",", ":")).encode()
+	base = -(-(len(INDEX_MAGIC) + 8 + len(blob)) // INDEX_ALIGN) * INDEX_ALIGN
+	with open(tmp := f"{f}.tmp", "wb") as io:
+		io.write(INDEX_MAGIC + len(blob).to_bytes(8, "little") + blob)
+		for k, v in cols.items():
+			io.seek(base + head["cols"][k]["offset"])
+			io.write(numpy.ascontiguousarray(v).tobytes())
+		io.truncate(base + offset)
+	os.replace(tmp, f)
+
+def read_index_header(f: Path | str) -> tuple[dict[str, Any], int]:
+	with open(f, "rb") as io:
+		if io.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+			raise ValueError(f"not a bhm index: `{f}`")
+		n = int.from_bytes(io.read(8), "little")
+		head = JSON.loads(io.read(n))
+	return head, -(-(len(INDEX_MAGIC) + 8 + n) // INDEX_ALIGN) * INDEX_ALIGN
+
+def open_index(f: Path | str, stamp: None | dict[str, int] = None) -> None | BhmIndex:
+	"""
+	Open a columnar index file with `numpy.memmap`; return `None` if it is missing or not built from `stamp`.
+	"""
+	try:
+		head, base = read_index_header(f)
+	except (OSError, ValueError):
+		return None
+	if stamp is not None and head["stamp"] != stamp:
+		return None
+
+	def col(k: str) -> ndarray:
+		c = head["cols"][k]
+		if not c["shape"][0]: return numpy.empty(c["shape"], c["dtype"])
+		return numpy.memmap(f, c["dtype"], "r", base + c["offset"], tuple(c["shape"]))
+
+	def table(name: str) -> Table:
+		if f"{name}.key" not in head["cols"]: # built by an older version
+			return Table(numpy.empty(0, numpy.int64), numpy.zeros(1, numpy.int64), numpy.empty(0, numpy.int64))
+		return Table(col(f"{name}.key"), col(f"{name}.ptr"), col(f"{name}.val"))
+
+	return BhmIndex(head["hdr"], head["prg"], fld=table("fld"), sid=table("sid"), cat=table("cat"),
+		run=table("run"), all=table("all"), stamp=head["stamp"])
@@ -0,0 +1,42 @@
+from typing import Any
+
+from .base import isa
+from .index import build_index, filestamp, json_items, open_index
+
+data: dict[str, Any] = dict(
+	hdr=dict(date="2026-01-21T16:03:14", brch=["v6_1_3", "v6_2_1", "master"],
+		alle=["allepoch@v6_1_3", "allepoch_apo@v6_2_1"]),
+	prg={"SDSS-RM": [15171, 15172]},
+	fld={"15172": [2, 1], "15171": [3], "SDSS-RM-all": [1, 2, 3]},
+	sid={"7": [1, 3], "5": [2]},
+	cat={"3": [7, 1517159281], "1": [7, 1517159281, 1517259282], "2": [5]},
+	run={"3": [0b101], "1": [0b001, 0b110]},
+	all={"1": [59282, 159282, 159290]},
+)
+
+def testset_index() -> None:
+	stamp = filestamp("util/index.py")
+	build_index("temp/bhm.idx", json_items(data), stamp)
+	assert open_index("temp/bhm.idx", dict(size=0, time=0)) is None
+	assert open_index("temp/bhm.none") is None
+	with open("temp/bhm.idx", "r+b") as io: io.write(b"BHMIDX\x00\x01")
+	assert open_index("temp/bhm.idx", stamp) is None # an older layout
+	build_index("temp/bhm.idx", json_items(data), stamp)
+	idx = open_index("temp/bhm.idx", stamp)
+	assert idx is not None
+	assert idx.hdr == data["hdr"] and idx.prg == data["prg"]
+	assert idx.cat.get("1") == [7, 1517159281, 1517259282]
+	assert idx.cat.get("4", [0]) == [0]
+	assert idx.cat.get("x") is None
+	assert idx.fld["SDSS-RM-all"] == [1, 2, 3]
+	assert idx.fld["15172"] == [2, 1]
+	assert sorted(idx.sid) == ["5", "7"] and len(idx.sid) == 2
+	assert "7" in idx.sid and "8" not in idx.sid
+	assert isa(idx.sid["5"][0], int)
+	assert idx.branches(15171, 59281, 3) == ["master", "v6_1_3"]
+	assert idx.branches(15172, 59282, "1") == ["master", "v6_2_1"]
+	assert idx.branches(15172, 59281, "1") is None
+	assert idx.branches(15172, 59282, "2") is None
+	assert idx.allepochs(59282, 1) == [("allepoch", "v6_1_3"), ("allepoch_apo", "v6_2_1")]
+	assert idx.allepochs(59281, "1") == [] and idx.allepochs(59282, 3) == []
+	assert idx.allepochs(59282, 4) is None
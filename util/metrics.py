@@ -0,0 +1,98 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Any
+
+from .base import T
+
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30) # seconds
+
+MetricLabels = tuple[tuple[str, str], ...]
+
+def metric_labels(labels: MetricLabels) -> str:
+	if not labels: return ""
+	def esc(v: str) -> str: return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+	return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels) + "}"
+
+class Metrics:
+	"""
+	A thread-safe registry of counters and histograms (by name and labels), rendered in the Prometheus text
+	format by `render`. Gauges (e.g., sizes of caches) are read upon rendering from the registered collectors,
+	each returning `(name, labels, value)` triples.
+	"""
+	__slots__ = ("buckets", "counters", "hists", "collectors", "lock")
+
+	def __init__(self, buckets: tuple[float, ...] = METRICS_BUCKETS) -> None:
+		self.buckets, self.counters, self.hists = buckets, dict[str, dict[MetricLabels, float]](), dict[str, dict[MetricLabels, list[float]]]()
+		self.collectors, self.lock = list[Callable[[], Iterable[tuple[str, dict[str, str], float]]]](), Lock()
+
+	def inc(self, name: str, n: float = 1, **labels: str) -> None:
+		k = tuple(sorted(labels.items()))
+		with self.lock:
+			c = self.counters.setdefault(name, {})
+			c[k] = c.get(k, 0) + n
+
+	def observe(self, name: str, x: float, **labels: str) -> None:
+		"""
+		Record `x` in the histogram `name`, as `[count of each bucket..., count, sum]` (not cumulative).
+		"""
+		k = tuple(sorted(labels.items()))
+		with self.lock:
+			h = self.hists.setdefault(name, {})
+			if (v := h.get(k)) is None: v = h[k] = [0] * (len(self.buckets) + 2)
+			i = bisect_left(self.buckets, x)
+			if i < len(self.buckets): v[i] += 1
+			v[-2] += 1
+			v[-1] += x
+
+	def timed(self, name: str, **labels: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+		"""
+		A decorator to record the duration (in seconds) of every call in the histogram `name`, labeled by the
+		name of the function (as `func`), whether it returns or raises.
+		"""
+		def decorator(func: Callable[..., T]) -> Callable[..., T]:
+			lab = dict(func=func.__name__, **labels)
+			@wraps(func)
+			def wrapper(*args, **kws) -> T:
+				t = perf_counter()
+				try: return func(*args, **kws)
+				finally: self.observe(name, perf_counter() - t, **lab)
+			return wrapper
+		return decorator
+
+	def collect(self, func: Callable[[], Iterable[tuple[str, dict[str, str], float]]]) -> Callable[[], Any]:
+		"""
+		Register `func` (which may be used as a decorator) to be called upon rendering, for gauges.
+		"""
+		self.collectors.append(func)
+		return func
+
+	def render(self) -> str:
+		out = list[str]()
+		with self.lock:
+			for name, c in sorted(self.counters.items()):
+				out.append(f"# TYPE {name} counter")
+				out.extend(f"{name}{metric_labels(k)} {v:g}" for k, v in sorted(c.items()))
+			for name, h in sorted(self.hists.items()):
+				out.append(f"# TYPE {name} histogram")
+				for k, v in sorted(h.items()):
+					n = 0.0
+					for b, x in zip(self.buckets, v):
+						n += x
+						out.append(f"{name}_bucket{metric_labels(k + (('le', f'{b:g}'),))} {n:g}")
+					out.append(f"{name}_bucket{metric_labels(k + (('le', '+Inf'),))} {v[-2]:g}")
+					out.append(f"{name}_count{metric_labels(k)} {v[-2]:g}")
+					out.append(f"{name}_sum{metric_labels(k)} {v[-1]:g}")
+		gauges = dict[str, list[str]]()
+		for f in self.collectors:
+			try:
+				for name, labels, x in f():
+					gauges.setdefault(name, []).append(f"{name}{metric_labels(tuple(sorted(labels.items())))} {x:g}")
+			except Exception as e:
+				print(f"[Metrics] {e!r}")
+		for name, xs in sorted(gauges.items()):
+			out.append(f"# TYPE {name} gauge")
+			out.extend(xs)
+		return "\n".join(out) + "\n"
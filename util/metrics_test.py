@@ -0,0 +1,34 @@
+from .metrics import Metrics, metric_labels
+
+
+def testset_metrics() -> None:
+	m = Metrics((0.1, 1))
+	m.inc("hits_total", layer="disk")
+	m.inc("hits_total", 2, layer="disk")
+	m.inc("bytes_total", 1024)
+	for x in (0.05, 0.5, 5): m.observe("fetch_seconds", x, func="fetch")
+	m.collect(lambda: [("cache_entries", dict(layer="lru"), 3)])
+	s = m.render().splitlines()
+	assert 'hits_total{layer="disk"} 3' in s
+	assert "bytes_total 1024" in s
+	assert "# TYPE fetch_seconds histogram" in s
+	assert 'fetch_seconds_bucket{func="fetch",le="0.1"} 1' in s
+	assert 'fetch_seconds_bucket{func="fetch",le="1"} 2' in s # cumulative
+	assert 'fetch_seconds_bucket{func="fetch",le="+Inf"} 3' in s
+	assert 'fetch_seconds_count{func="fetch"} 3' in s
+	assert 'fetch_seconds_sum{func="fetch"} 5.55' in s
+	assert 'cache_entries{layer="lru"} 3' in s
+	assert metric_labels((("a", 'x"\n'),)) == '{a="x\\"\\n"}'
+
+def testset_metrics_timed() -> None:
+	m = Metrics()
+
+	@m.timed("call_seconds")
+	def f(x: int) -> int:
+		if x < 0: raise ValueError(x)
+		return x
+	assert f(1) == 1 and f.__name__ == "f"
+	try: f(-1)
+	except ValueError: pass
+	else: assert False
+	assert 'call_seconds_count{func="f"} 2' in m.render().splitlines()
@@ -0,0 +1,134 @@
+import json as JSON
+import os
+from hashlib import sha256
+from io import BytesIO
+from random import uniform
+from re import findall
+from threading import Lock, get_ident
+from time import sleep
+from urllib.parse import unquote, urlsplit
+
+from requests import Response, Session
+from requests.structures import CaseInsensitiveDict
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+
+HTTP_POOL_SIZE = 16 # keep-alive connections per host, which is also the limit of concurrent requests
+HTTP_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# directory to save every exchange of `http_request` to, or to serve them from (without network access)
+http_record = os.getenv("HTTP_RECORD", "")
+http_replay = os.getenv("HTTP_REPLAY", "")
+
+http_sessions: dict[str, Session] = {}
+http_sessions_lock = Lock()
+
+def http_session(url: str) -> Session:
+	"""
+	The shared session (with a keep-alive connection pool) for the host of `url`.
+	"""
+	host = urlsplit(url).netloc
+	with http_sessions_lock:
+		if (s := http_sessions.get(host)) is None:
+			s = http_sessions[host] = Session()
+			a = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, pool_block=True)
+			s.mount("http://", a)
+			s.mount("https://", a)
+	return s
+
+def http_backoff(n: int, base: float = 0.5, cap: float = 30) -> float:
+	"""
+	The delay before the `n`-th retry (zero-based), i.e., exponential backoff with full jitter.
+	"""
+	return uniform(0, min(cap, base * 2**n))
+
+def http_retry_after(rv: Response, cap: float = 60) -> None | float:
+	s = rv.headers.get("Retry-After", "")
+	return min(cap, float(s)) if s.isdigit() else None
+
+def http_request(method: str, url: str, auth: None | tuple[str, str] = None, timeout: float = 5,
+	retries: int = 4, **kws) -> Response:
+	"""
+	Send a request through the shared session of the host, retrying (at most `retries` times, with backoff)
+	upon connection errors, timeouts, and responses with status in `HTTP_RETRY_STATUS`.
+	The exchange is saved to `http_record` or served from `http_replay`, if set (see `http_archive_key`).
+	"""
+	if http_replay:
+		if rv := http_load(http_replay, key := http_archive_key(method, url, kws)): return rv
+		raise ConnectionError(f"[http_request] not recorded: {method} {url} ({key})")
+	n = 0
+	while True:
+		try:
+			rv = http_session(url).request(method, url, auth=auth, timeout=timeout, **kws)
+			if n == retries or rv.status_code not in HTTP_RETRY_STATUS:
+				if http_record: http_save(http_record, http_archive_key(method, url, kws), rv)
+				return rv
+			delay = http_retry_after(rv) or http_backoff(n)
+		except (ChunkedEncodingError, ConnectionError, Timeout) as e: # Connection broken | ConnectTimeout | ...
+			if n == retries: raise
+			print(f"[http_request] {e!r}")
+			delay = http_backoff(n)
+		sleep(delay)
+		n += 1
+
+def http_listing(html: str) -> frozenset[str]:
+	"""
+	The file names linked from a directory index page (e.g., of Apache), excluding subdirectories and queries.
+	"""
+	return frozenset(unquote(x) for x in findall(r'(?i)href="([^"/?#]+)"', html))
+
+class RangeFile:
+	"""
+	A remote file read in parts by HTTP range requests, or as a whole if the server does not support them.
+	"""
+	__slots__ = ("url", "auth", "timeout", "data", "size")
+
+	def __init__(self, url: str, auth: None | tuple[str, str] = None, timeout: float = 5) -> None:
+		self.url, self.auth, self.timeout = url, auth, timeout
+		self.data: None | bytes = None # the whole file, if the range is ignored
+		self.size = 0 # bytes transferred
+
+	def read(self, start: int, stop: int) -> bytes:
+		if self.data is not None: return self.data[start:stop]
+		rv = http_request("GET", self.url, self.auth, self.timeout, headers={"Range": f"bytes={start}-{stop - 1}"})
+		if rv.status_code == 416: return b"" # range not satisfiable, i.e., beyond the end
+		rv.raise_for_status() # HTTPError
+		self.size += len(rv.content)
+		if rv.status_code == 206: return rv.content
+		self.data = rv.content
+		return self.data[start:stop]
+
+def http_archive_key(method: str, url: str, kws: dict) -> str:
+	"""
+	The name of an exchange in the archive, which depends on the method, url, and range (but not credentials).
+	"""
+	rng = (kws.get("headers") or {}).get("Range", "")
+	return sha256(f"{method} {url} {rng}".encode()).hexdigest()[:32]
+
+def http_save(d: str, key: str, rv: Response) -> None:
+	"""
+	Save a response as `{d}/{key}.http`, i.e., a line of JSON (method, url, status, ...) followed by the body.
+	"""
+	headers = {k: v for k, v in rv.headers.items() if k.lower() not in ("content-encoding", "transfer-encoding")}
+	head = dict(method=rv.request.method, url=rv.url, status=rv.status_code, reason=rv.reason, headers=headers)
+	os.makedirs(d, exist_ok=True)
+	with open(tmp := f"{d}/{key}.{os.getpid()}.{get_ident()}.tmp", "wb") as io: # unique per thread
+		io.write(JSON.dumps(head).encode() + b"\n" + rv.content)
+	os.replace(tmp, f"{d}/{key}.http")
+
+def http_load(d: str, key: str) -> None | Response:
+	try:
+		with open(f"{d}/{key}.http", "rb") as io: head, body = io.read().split(b"\n", 1)
+	except OSError:
+		return None
+	h = JSON.loads(head)
+	return http_response(h["status"], h["url"], h["reason"], h["headers"], body)
+
+def http_response(status: int, url: str, reason: str, headers: dict[str, str], body: bytes) -> Response:
+	"""
+	A `Response` of the given fields, with `body` read (as the content) from memory.
+	"""
+	rv = Response()
+	rv.status_code, rv.url, rv.reason, rv.raw = status, url, reason, BytesIO(body)
+	rv.headers = CaseInsensitiveDict(headers)
+	return rv
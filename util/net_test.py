@@ -0,0 +1,52 @@
+import shutil
+
+from requests import PreparedRequest, Response
+from requests.exceptions import ConnectionError
+
+from . import net
+from .net import http_archive_key, http_backoff, http_listing, http_load, http_request, http_retry_after
+from .net import http_response, http_save, http_session
+
+
+def testset_backoff() -> None:
+	assert all(0 <= http_backoff(n) <= 0.5 * 2**n for n in range(6))
+	assert all(0 <= http_backoff(n) <= 30 for n in range(99))
+
+def testset_retry_after() -> None:
+	rv = Response()
+	assert http_retry_after(rv) is None
+	rv.headers["Retry-After"] = "7"
+	assert http_retry_after(rv) == 7
+	rv.headers["Retry-After"] = "3600"
+	assert http_retry_after(rv) == 60
+
+def testset_session() -> None:
+	a = http_session("https://data.sdss.org/sas/dr19/")
+	b = http_session("https://data.sdss.org/sas/dr18/")
+	c = http_session("https://data.sdss5.org/sas/sdsswork/")
+	assert a is b and a is not c
+
+def testset_listing() -> None:
+	html = """<a href="?C=N;O=D">Name</a><a href="/sas/">Parent Directory</a><a href="sub/">sub/</a>
+	<a href="spec-015000-59000-1.fits">x</a> <A HREF="spec-015000-59000-2%2B.fits">y</A>"""
+	assert http_listing(html) == {"spec-015000-59000-1.fits", "spec-015000-59000-2+.fits"}
+	assert http_listing("") == frozenset()
+
+def testset_archive() -> None:
+	shutil.rmtree("temp/http", ignore_errors=True)
+	url = "https://data.sdss.org/sas/x.fits"
+	key = http_archive_key("GET", url, dict(headers={"Range": "bytes=0-9"}))
+	assert key != http_archive_key("GET", url, {}) and key != http_archive_key("HEAD", url, {})
+	rv = http_response(206, url, "Partial", {"Content-Range": "bytes 0-9/99"}, b"\n\0" * 5)
+	rv.request, rv.request.method = PreparedRequest(), "GET"
+	http_save("temp/http", key, rv)
+	assert http_load("temp/http", "none") is None
+	net.http_replay = "temp/http"
+	try:
+		rv = http_request("GET", url, headers={"Range": "bytes=0-9"})
+		assert rv.status_code == 206 and rv.content == b"\n\0" * 5 and rv.headers["content-range"] == "bytes 0-9/99"
+		try: http_request("HEAD", url)
+		except ConnectionError: pass
+		else: assert False
+	finally:
+		net.http_replay = ""
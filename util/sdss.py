@@ -1,7 +1,9 @@
+import os
 from collections.abc import Iterable
-from re import fullmatch
+from functools import lru_cache
+from re import fullmatch, sub
 
-from .base import isa
+from .base import isa, isfile
 from .math import signbit
 from .unit import deg2dms, deg2hms
 
@@ -78,10 +80,30 @@ def sdss_sas_fits(field: int | str, mjd: int, obj: int | str, branch: str) -> tu
 # speclink example:
 # https://data.sdss5.org/sas/sdsswork/bhm/boss/spectro/redux/v6_2_1/images/daily/v6_2_1/109XXX/109167/109167-60973/spec-image-109167-60973-63050395805349051.png
 
+def sdss_sas_rebase(url: str, root: str) -> str:
+	"""
+	Redirect a SAS url (of `data.sdss.org` or `data.sdss5.org`) to another `sas` root, e.g., a stand-in server.
+	"""
+	return sub(r"^https://data\.sdss5?\.org/sas/", root.rstrip("/") + "/", url) if root else url
+
+def sdss_sas_local(url: str, roots: Iterable[str]) -> None | str:
+	"""
+	The local copy of a SAS file (given its url) in the first of the mirror `roots` (of the `sas` tree) having it.
+	"""
+	if "/sas/" not in url: return None
+	path = url.split("/sas/", 1)[1]
+	for root in roots:
+		if isfile(f := os.path.join(root, path)): return f
+	return None
+
 def sdss_iau(α: float, δ: float) -> str:
 	"""
-	A function to generate the IAU-format string for a given RA & DEC
+	A function to generate the IAU-format string for a given RA & DEC (cached, as epochs share coordinates)
 	"""
+	return _sdss_iau(α, δ, signbit(δ)) # tell -0.0 from +0.0 apart, which compare (and hash) equal
+
+@lru_cache(2**12)
+def _sdss_iau(α: float, δ: float, _: bool) -> str:
 	def _str(x: float, tpl="00") -> str:
 		return f"{x:+010.6f}"[1:len(tpl) + 1]
 
@@ -1,4 +1,5 @@
-from .sdss import sdss_iau, sdss_sas_fits, sdss_zwarn
+from .base import Path, write
+from .sdss import sdss_iau, sdss_sas_fits, sdss_sas_local, sdss_sas_rebase, sdss_zwarn
 
 
 def func(*xs) -> str: return sdss_sas_fits(*xs)[0]
@@ -137,3 +138,19 @@ def testset_sdss_zwarn_0257() -> None:
 def testset_sdss_zwarn_0514() -> None:
 	assert sorted(map(str.upper, sdss_zwarn( 514))) == ["LITTLE_COVERAGE", "NODATA"]
 
+
+def testset_local() -> None:
+	url = func(266, 51602, 1, "26")
+	path = "temp/sas/dr19/spectro/sdss/redux/26/spectra/lite/0266/spec-0266-51602-0001.fits"
+	Path(path).parent.mkdir(parents=True, exist_ok=True)
+	write(path, b"")
+	assert sdss_sas_local(url, ["temp/none", "temp/sas"]) == path
+	assert sdss_sas_local(url, ["temp/none"]) is None
+	assert sdss_sas_local("https://example.org/x.fits", ["temp/sas"]) is None
+
+def testset_rebase() -> None:
+	url = func(266, 51602, 1, "26")
+	assert sdss_sas_rebase(url, "") == url
+	assert sdss_sas_rebase(url, "http://127.0.0.1:8000/sas/") == \
+		"http://127.0.0.1:8000/sas/dr19/spectro/sdss/redux/26/spectra/lite/0266/spec-0266-51602-0001.fits"
+	assert sdss_sas_rebase(func(101234, 60000, 5, "master"), "http://x/sas").startswith("http://x/sas/sdsswork/bhm/")
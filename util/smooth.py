@@ -0,0 +1,29 @@
+import numpy
+from numpy import ndarray
+
+
+def box_smooth(x: ndarray, width: int) -> ndarray:
+	"""
+	The moving average of `x` (1-D, or 2-D by rows) by a box of `width` pixels, as `convolve(x, Box1DKernel(width))`
+	of astropy with its defaults (i.e., zeros beyond the edges, NaN interpolated, and half weights at both ends for
+	an even `width`), but in O(n) by cumulative sums, regardless of `width`. The result has the (float) dtype of `x`.
+	"""
+	if x.dtype.kind != "f": x = x.astype(numpy.float64)
+	if width <= 1: return x
+	h = width // 2
+	ok = ~numpy.isnan(x)
+	pad = [(0, 0)] * (x.ndim - 1) + [(h + 1, h)] # a leading zero for the differences of cumulative sums
+	v = numpy.pad(numpy.where(ok, x, 0).astype(numpy.float64), pad).cumsum(-1)
+	m = numpy.pad(ok.astype(numpy.float64), pad, constant_values=1) # zeros beyond the edges are counted
+	m[..., 0] = 0
+	m = m.cumsum(-1)
+	n = x.shape[-1]
+
+	def window(s: ndarray) -> ndarray: # sum over [i - h, i + h] of each i (the cumulative sums `s` of the padded)
+		r = s[..., 2 * h + 1:] - s[..., :n]
+		if width % 2 == 0: # half weights at both ends
+			r -= 0.5 * (s[..., 2 * h + 1:] - s[..., 2 * h:-1] + s[..., 1:n + 1] - s[..., :n])
+		return r
+
+	with numpy.errstate(divide="ignore", invalid="ignore"):
+		return (window(v) / window(m)).astype(x.dtype, copy=False)
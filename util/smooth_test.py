@@ -0,0 +1,23 @@
+from warnings import catch_warnings, simplefilter
+
+import numpy
+from astropy.convolution import Box1DKernel, convolve # type: ignore[import-untyped]
+
+from .smooth import box_smooth
+
+
+def testset_smooth() -> None:
+	rng = numpy.random.default_rng(0)
+	x = rng.normal(10, 3, (3, 500)).astype(numpy.float32)
+	x[0, 100:110] = x[1, 0] = x[1, -1] = x[2, ::7] = numpy.nan
+	x[2, 200:300] = numpy.nan # wider than some boxes
+	for w in (1, 2, 3, 4, 5, 10, 51, 435):
+		y = box_smooth(x, w)
+		assert y.shape == x.shape and y.dtype == numpy.float32
+		for i in range(len(x)):
+			with catch_warnings():
+				simplefilter("ignore")
+				z = convolve(x[i], Box1DKernel(w))
+			assert numpy.array_equal(numpy.isnan(y[i]), numpy.isnan(z))
+			assert numpy.allclose(y[i], z, rtol=1e-5, atol=1e-5, equal_nan=True)
+			assert numpy.array_equal(box_smooth(x[i], w), y[i], equal_nan=True) # 1-D
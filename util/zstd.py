@@ -0,0 +1,38 @@
+import os
+import shutil
+from pathlib import Path
+
+from pyzstd import DParameter, ZstdDict, ZstdError, decompress, get_frame_info
+from pyzstd import open as ZSTD
+
+from .base import isfile
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def unzstd(f: Path | str) -> bytes:
+	with ZSTD(f) as io: return io.read()
+
+def unzstd_patch(base: bytes, patch: bytes) -> bytes:
+	"""
+	Apply a delta patch made by `zstd --patch-from=<base>` to `base`. The patch must carry a content
+	checksum (the default of the zstd CLI), which is verified by the decoder upon decompression.
+	"""
+	if not (patch[:4] == ZSTD_MAGIC and patch[4] & 0b100):
+		raise ZstdError("zstd patch without content checksum")
+	return decompress(patch, ZstdDict(base, is_raw=True), {DParameter.windowLogMax: 31})
+
+def unzstd_sibling(f: str) -> bool:
+	"""
+	Update (override) the decompressed sibling of `f` (e.g., `bhm.json` of `bhm.json.zst`), only if it
+	already exists and is stale, by streaming. The sibling is stamped with the modification time of `f`,
+	which is, along with the content size recorded in the zstd frame, checked to skip unchanged files.
+	"""
+	if not (f.endswith(e := ".zst") and isfile(g := f[:-len(e)])): return False
+	s, t = os.stat(f), os.stat(g)
+	with open(f, "rb") as io: size = get_frame_info(io.read(18)).decompressed_size
+	if t.st_mtime_ns == s.st_mtime_ns and size in (None, t.st_size): return False
+	with ZSTD(f) as src, open(tmp := f"{g}.tmp", "wb") as dst:
+		shutil.copyfileobj(src, dst, 2**20)
+	os.utime(tmp, ns=(s.st_atime_ns, s.st_mtime_ns))
+	os.replace(tmp, g)
+	return True
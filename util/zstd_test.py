@@ -0,0 +1,40 @@
+import shutil
+import subprocess
+
+from pyzstd import CParameter, ZstdDict, ZstdError, compress
+
+from .base import Path, write
+from .zstd import unzstd, unzstd_patch, unzstd_sibling
+
+
+def testset_patch() -> None:
+	base = b"".join(b'"%d":[%d,%d],' % (i, i * 7, i * 13) for i in range(9999))
+	data = base[:5000] + b'"0":[1],' + base[6000:]
+	zstd = ZstdDict(base, is_raw=True)
+	assert unzstd_patch(base, compress(data, {CParameter.checksumFlag: 1}, zstd)) == data
+	try: unzstd_patch(base, compress(data, {CParameter.checksumFlag: 0}, zstd))
+	except ZstdError: pass
+	else: assert False
+
+def testset_patch_cli() -> None:
+	if not shutil.which("zstd"): return # the zstd CLI is not installed
+	base = b"".join(b'"%d":[%d,%d],' % (i, i * 7, i * 13) for i in range(99999))
+	data = base[:5000] + b'"0":[1],' + base[6000:] + b'"99999":[0,0]'
+	write("temp/x.base", base)
+	write("temp/x.json", data)
+	for long in ("--long", "--long=31"): # as `zstdpatch` of `update_dictionaries.jl` makes the patch
+		cmd = ["zstd", "-q", "-f", "-1", long, "--zstd=strat=7,tlen=4096", "--patch-from=temp/x.base", "temp/x.json",
+			"-o", "temp/x.patch"]
+		subprocess.run(cmd, check=True)
+		patch = open("temp/x.patch", "rb").read()
+		assert len(patch) < len(data) // 100 and unzstd_patch(base, patch) == data
+
+def testset_sibling() -> None:
+	Path("temp/x.json").unlink(missing_ok=True)
+	write("temp/x.json.zst", compress(b"{}"))
+	assert unzstd("temp/x.json.zst") == b"{}"
+	assert unzstd_sibling("temp/x.json.zst") == False # not exists
+	write("temp/x.json", b"")
+	assert unzstd_sibling("temp/x.json.zst") == True
+	assert unzstd_sibling("temp/x.json.zst") == False # up to date
+	assert unzstd("temp/x.json.zst") == open("temp/x.json", "rb").read()